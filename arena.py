@@ -0,0 +1,234 @@
+import os
+import argparse
+import itertools
+import math
+import time
+import pygame
+from simulation import Simulation
+from levelpack import load_levels, default_levels_path
+from sweep import plan_route, RouteFollower
+
+# Level sizes in levels.json are tuned for boards about this many pixels across
+REFERENCE_BOUNDS = 800
+# Route variants planned per level; boards share them round-robin
+ROUTE_VARIANTS = 4
+# Key orders tried per level before a bot falls back to walking at the exit
+MAX_ORDERS = 6
+
+class ScaledLevels:
+    """
+    Read-only view of a level list with entity sizes scaled for smaller boards.
+    Each scaled config is built once and shared by every board, so they all
+    hit the same LevelTemplate cache entries.
+    """
+    def __init__(self, levels, scale):
+        self.levels = levels
+        self.scale = scale
+        self.cache = {}
+
+    def __len__(self):
+        return len(self.levels)
+
+    def __getitem__(self, index):
+        config = self.cache.get(index)
+        if config is None:
+            config = dict(self.levels[index])
+            config['size'] = config['size'] * self.scale
+            self.cache[index] = config
+        return config
+
+class EffectsOnly:
+    """Level observer forwarding only sound effects, so many boards don't fight over the music."""
+    def __init__(self, audio):
+        self.audio = audio
+
+    def on_level_event(self, level, event):
+        if event in ("unlock", "death"):
+            self.audio.play(event)
+
+class Board:
+    """One tile of the arena: a simulation in tile-local coordinates and the bot steering it."""
+    def __init__(self, index, rect, simulation):
+        self.index = index
+        self.rect = rect
+        self.simulation = simulation
+        self.follower = None
+        self.follower_level = None
+        self.runs = 0
+        self.best_frames = None
+        # Dirty-rect state: which static layer is painted and where the sprites were
+        self.static_key = None
+        self.dirty = []
+        self.surface = None
+        self.surface_parent = None
+
+class Arena:
+    """
+    Runs count Levels side by side in a grid of tiles, each driven by a bot.
+    Boards simulate at the same tile-local placement, so level geometry,
+    scaled sprite images and planned routes are shared between them, and
+    step() advances every board in one pass. Finished boards start over.
+    """
+    def __init__(self, levels, count, area, font, observers=None, variants=ROUTE_VARIANTS):
+        self.levels = levels
+        self.area = pygame.Rect(area)
+        self.font = font
+        self.variants = variants
+        # (level index, variant) -> waypoints, or None when no key order works
+        self.routes = {}
+
+        # The level title sits in a strip above each board
+        title_height = font.get_linesize() + 12
+        margin = 8
+
+        def board_size(columns):
+            rows = math.ceil(count / columns)
+            return min(self.area.width // columns - 2 * margin,
+                       self.area.height // rows - title_height - margin)
+
+        # The grid shape that gives the largest boards
+        columns = max(range(1, count + 1), key=board_size)
+        rows = math.ceil(count / columns)
+        tile_width = self.area.width // columns
+        tile_height = self.area.height // rows
+        self.bounds = max(1, board_size(columns))
+        self.scaled = ScaledLevels(levels, self.bounds / REFERENCE_BOUNDS)
+        board_x = (tile_width - self.bounds) // 2
+
+        self.boards = []
+        for i in range(count):
+            rect = pygame.Rect(self.area.x + (i % columns) * tile_width,
+                               self.area.y + (i // columns) * tile_height, tile_width, tile_height)
+            simulation = Simulation(self.scaled, board_x, title_height, self.bounds, observers, keep_recent=1)
+            simulation.start()
+            self.boards.append(Board(i, rect, simulation))
+        self.background = None
+
+    def route(self, board):
+        """Waypoints for the board's current level, planned once per (level, variant)."""
+        simulation = board.simulation
+        key = (simulation.level_num, board.index % self.variants)
+        if key not in self.routes:
+            # Variant 0 takes the planner's line, the others jitter it
+            seed = key[1] - 1 if key[1] else None
+            keys = range(len(simulation.level.keys))
+            waypoints = None
+            for order in itertools.islice(itertools.permutations(keys), MAX_ORDERS):
+                waypoints = plan_route(simulation, order, seed)
+                if waypoints is not None:
+                    break
+            self.routes[key] = waypoints
+        return self.routes[key]
+
+    def target(self, board):
+        """The bot's target for this step, re-planned whenever the board moves on to a new level."""
+        level = board.simulation.level
+        if board.follower_level is not level:
+            waypoints = self.route(board)
+            if waypoints is None:
+                board.follower = RouteFollower([(level.exit.x, level.exit.y)], level.size / 2)
+            else:
+                board.follower = RouteFollower(waypoints, level.player.speed * 2)
+            board.follower_level = level
+        return board.follower(board.simulation)
+
+    def step(self):
+        """Advance every board by one fixed step."""
+        for board in self.boards:
+            simulation = board.simulation
+            if simulation.step(*self.target(board)):
+                board.runs += 1
+                if board.best_frames is None or simulation.frame < board.best_frames:
+                    board.best_frames = simulation.frame
+                simulation.start()
+
+    def results(self):
+        """Per-board completed runs, best run in frames and deaths in the current run."""
+        return [{"board": board.index, "runs": board.runs, "best_frames": board.best_frames,
+                 "deaths": board.simulation.deaths} for board in self.boards]
+
+    def draw(self, screen, backdrop=None, alpha=1.0):
+        """
+        Draw every board onto screen, repainting a board's static layer only
+        when its level changed, and return the screen rects that changed.
+        """
+        changed = []
+        if self.background is None or self.background.get_size() != screen.get_size():
+            self.background = pygame.Surface(screen.get_size())
+            self.background.fill("black")
+            if backdrop is not None:
+                self.background.blit(backdrop, (0, 0))
+            screen.blit(self.background, (0, 0))
+            changed.append(screen.get_rect())
+            for board in self.boards:
+                board.static_key = None
+        for board in self.boards:
+            level = board.simulation.level
+            if board.surface_parent is not screen:
+                board.surface = screen.subsurface(board.rect)
+                board.surface_parent = screen
+            key = (id(level), level.static_version)
+            if key != board.static_key:
+                tile = self.background.subsurface(board.rect)
+                tile.fill("black")
+                if backdrop is not None:
+                    tile.blit(backdrop, (0, 0), board.rect)
+                level.draw_static(tile, self.font)
+                board.static_key = key
+                screen.blit(self.background, board.rect, board.rect)
+                changed.append(board.rect)
+            else:
+                # Erase last frame's sprites by restoring the background underneath them
+                for rect in board.dirty:
+                    screen.blit(self.background, rect, rect)
+                changed.extend(board.dirty)
+            rects = level.draw_dynamic(board.surface, alpha)
+            board.dirty = [rect.move(board.rect.topleft).clip(board.rect) for rect in rects]
+            changed.extend(board.dirty)
+        return changed
+
+    def close(self):
+        for board in self.boards:
+            board.simulation.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many bot-driven boards side by side.")
+    parser.add_argument("boards", type=int, nargs="?", default=16, help="number of boards")
+    parser.add_argument("--levels", default=None, help="levels.json or a compiled .kqp pack")
+    parser.add_argument("--frames", type=int, default=60 * 60, help="simulation steps to run")
+    parser.add_argument("--size", type=int, nargs=2, default=(1280, 720), help="arena size in pixels")
+    parser.add_argument("--render", action="store_true", help="draw every frame (headless unless a display is set)")
+    args = parser.parse_args()
+
+    if not args.render:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    screen = pygame.display.set_mode(args.size)
+    font = pygame.font.Font("assets/fonts/Firlest-Regular.otf", 24)
+    levels = load_levels(args.levels or default_levels_path())
+
+    start = time.perf_counter()
+    arena = Arena(levels, args.boards, screen.get_rect(), font)
+    setup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(args.frames):
+        arena.step()
+        if args.render:
+            if any(event.type == pygame.QUIT for event in pygame.event.get()):
+                break
+            pygame.display.update(arena.draw(screen))
+    elapsed = time.perf_counter() - start
+    arena.close()
+    pygame.quit()
+
+    for result in arena.results():
+        best = f"{result['best_frames']} frames" if result['best_frames'] else "-"
+        print(f"board {result['board']:>3}: {result['runs']} runs, best {best}")
+    steps = args.frames * args.boards
+    print(f"{args.boards} boards set up in {setup:.2f}s; {steps} board steps in {elapsed:.2f}s "
+          f"({steps / elapsed:.0f} steps/s)")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,194 @@
+import pygame
+import os
+import threading
+from collections import OrderedDict
+
+# Sprite images used by the entities, preloaded once at startup
+SPRITE_PATHS = [
+    "assets/images/knight.png",
+    "assets/images/doorway.png",
+    "assets/images/key.png",
+    "assets/images/spiked-dragon-head.png",
+]
+# Facing directions pre-rendered per rotating sprite
+ROTATION_STEPS = 32
+# Pre-scaled backgrounds, one uncompressed BMP per source, size and quality (BMP loads far faster than PNG)
+BACKGROUND_CACHE_DIR = os.path.join("cache", "backgrounds")
+# "smooth" filters when scaling (smoothscale), "fast" samples the nearest pixel (scale)
+QUALITIES = ("smooth", "fast")
+
+class AssetManager:
+    """
+    Process-wide image cache so entities don't reload PNGs on every construction.
+    Safe to fill from a level-preloading thread; the cache is locked but the
+    decoding and scaling work is not. Every surface it hands out is in the
+    display format once a display mode is set.
+    """
+    def __init__(self, max_scaled=64, max_rotated=16, quality="smooth", cache_dir=BACKGROUND_CACHE_DIR):
+        if quality not in QUALITIES:
+            raise ValueError(f"quality must be one of {QUALITIES}, not {quality!r}")
+        self.max_scaled = max_scaled
+        self.max_rotated = max_rotated
+        self.quality = quality
+        self.cache_dir = cache_dir
+        # Decoded source images keyed by path (never evicted)
+        self.sources = {}
+        # Scaled variants keyed by (path, size), evicted least recently used first
+        self.scaled = OrderedDict()
+        # Rotation frame sets keyed by (path, size, steps, mirror), same eviction
+        self.rotated = OrderedDict()
+        # Full-screen backgrounds keyed by (path, size, quality); one per resolution seen
+        self.backgrounds = {}
+        self.lock = threading.Lock()
+
+    def set_quality(self, quality):
+        """Switch the scaling filter; images scaled with the old one are dropped."""
+        if quality not in QUALITIES:
+            raise ValueError(f"quality must be one of {QUALITIES}, not {quality!r}")
+        with self.lock:
+            if quality != self.quality:
+                self.quality = quality
+                self.scaled.clear()
+                self.rotated.clear()
+
+    def convert(self, surface, alpha=True):
+        """Convert a surface to the display format (with per-pixel alpha unless alpha is False) if a display mode is set."""
+        if pygame.display.get_surface() is None:
+            return surface
+        try:
+            return surface.convert_alpha() if alpha else surface.convert()
+        except pygame.error:
+            return surface
+
+    def scale(self, surface, size):
+        """Scale with the filter the quality setting asks for."""
+        if self.quality == "smooth" and surface.get_bitsize() in (24, 32):
+            return pygame.transform.smoothscale(surface, size)
+        return pygame.transform.scale(surface, size)
+
+    def source(self, path):
+        """Return the decoded, unscaled image for a path."""
+        with self.lock:
+            surface = self.sources.get(path)
+        if surface is None:
+            surface = self.convert(pygame.image.load(path))
+            with self.lock:
+                surface = self.sources.setdefault(path, surface)
+        return surface
+
+    def image(self, path, size):
+        """Return the image at path scaled to size (a number or a (w, h) tuple)."""
+        if not isinstance(size, tuple):
+            size = (size, size)
+        key = (path, size)
+        with self.lock:
+            surface = self.scaled.get(key)
+            if surface is not None:
+                self.scaled.move_to_end(key)
+                return surface
+        surface = self.convert(self.scale(self.source(path), size))
+        with self.lock:
+            self.scaled[key] = surface
+            if len(self.scaled) > self.max_scaled:
+                self.scaled.popitem(last=False)
+        return surface
+
+    def rotations(self, path, size, steps=ROTATION_STEPS, mirror=False):
+        """
+        Return a tuple of steps frames of the scaled image, frame i turned
+        i * 360 / steps degrees counterclockwise, rendered once and cached.
+        With mirror, frames turned past vertical use the horizontally flipped
+        image instead so side-on art never ends up upside down.
+        """
+        key = (path, size, steps, mirror)
+        with self.lock:
+            frames = self.rotated.get(key)
+            if frames is not None:
+                self.rotated.move_to_end(key)
+                return frames
+        base = self.image(path, size)
+        flipped = pygame.transform.flip(base, True, False) if mirror else None
+        frames = []
+        for i in range(steps):
+            angle = i * 360 / steps
+            if mirror and 90 < angle < 270:
+                frame = pygame.transform.rotozoom(flipped, angle - 180, 1)
+            else:
+                frame = pygame.transform.rotozoom(base, angle, 1)
+            frames.append(self.convert(frame))
+        frames = tuple(frames)
+        with self.lock:
+            self.rotated[key] = frames
+            if len(self.rotated) > self.max_rotated:
+                self.rotated.popitem(last=False)
+        return frames
+
+    def background(self, path, size):
+        """
+        Return the image at path scaled to size (w, h) as an opaque display-format
+        surface, so drawing it is a plain copy. The source is decoded at most once,
+        so a resolution change only rescales it, and each scaled size is kept on
+        disk for the next start.
+        """
+        size = (int(size[0]), int(size[1]))
+        key = (path, size, self.quality)
+        with self.lock:
+            surface = self.backgrounds.get(key)
+        if surface is not None:
+            return surface
+        cache_path = self._background_cache_path(path, size)
+        if cache_path is not None and os.path.exists(cache_path):
+            try:
+                surface = pygame.image.load(cache_path)
+            except pygame.error as e:
+                print(f"Error loading cached background {cache_path}: {e}")
+        if surface is not None and surface.get_size() == size:
+            surface = self.convert(surface, alpha=False)
+        else:
+            surface = self.convert(self.scale(self.source(path), size), alpha=False)
+            if cache_path is not None:
+                self._save_background(surface, cache_path)
+        with self.lock:
+            self.backgrounds[key] = surface
+        return surface
+
+    def _background_cache_path(self, path, size):
+        """Disk cache file for a scaled background; the source's size and mtime invalidate it."""
+        if self.cache_dir is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        name = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.cache_dir, f"{name}-{size[0]}x{size[1]}-{self.quality}-"
+                                            f"{stat.st_size:x}-{int(stat.st_mtime):x}.bmp")
+
+    def _save_background(self, surface, cache_path):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write under a temporary name so a crash never leaves half a file behind
+            temporary = cache_path + ".tmp.bmp"
+            pygame.image.save(surface, temporary)
+            os.replace(temporary, cache_path)
+        except (OSError, pygame.error) as e:
+            print(f"Error caching background {cache_path}: {e}")
+
+    def preload(self, paths=SPRITE_PATHS):
+        """Decode every image up front so the first level doesn't hit the disk."""
+        for path in paths:
+            try:
+                self.source(path)
+            except (pygame.error, FileNotFoundError) as e:
+                print(f"Error preloading image {path}: {e}")
+
+    def clear(self):
+        """Drop every cached surface (e.g. after the display mode changes)."""
+        with self.lock:
+            self.sources.clear()
+            self.scaled.clear()
+            self.rotated.clear()
+            self.backgrounds.clear()
+
+# Shared instance used by every entity
+assets = AssetManager()
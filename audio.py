@@ -0,0 +1,168 @@
+import pygame
+import io
+import re
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Sound effects decoded once at startup: name -> (path, priority)
+EFFECTS = {
+    "unlock": ("assets/sounds/unlock.mp3", 1),
+    "death": ("assets/sounds/death.mp3", 2),
+}
+
+def init_mixer():
+    """Start the mixer with low-latency settings, falling back to SDL's defaults."""
+    try:
+        pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=512)
+        print("Mixer initialized successfully")
+    except pygame.error as e:
+        print(f"Mixer initialization error: {e}")
+        try:
+            pygame.mixer.init()  # Fallback to default initialization
+        except pygame.error as e:
+            # AudioManager notices the mixer is missing and runs silently
+            print(f"Mixer fallback failed: {e}")
+
+class AudioManager:
+    """
+    Central audio service. Effects are decoded once and played on a fixed pool
+    of mixer channels with priority-based voice stealing. Level music is
+    streamed by pygame.mixer.music from an in-memory copy that a background
+    thread prefetches while the previous level is still being played.
+    Also a Level observer, reacting to 'start', 'reset', 'unlock' and 'death'.
+    """
+    def __init__(self, levels=None, channels=8, max_tracks=3):
+        self.levels = levels
+        self.enabled = pygame.mixer.get_init() is not None
+        self.effects = {}
+        self.channels = []
+        # Per-channel (priority, start time) of the voice currently playing on it
+        self.voices = []
+        # Level name -> track path (None when the level has no track)
+        self.track_paths = {}
+        # Track path -> file bytes, least recently used evicted first
+        self.tracks = OrderedDict()
+        self.max_tracks = max_tracks
+        self.tracks_lock = threading.Lock()
+        self.current_track = None
+        self.current_stream = None
+        if not self.enabled:
+            print("Mixer not initialized, audio disabled")
+            return
+
+        pygame.mixer.set_num_channels(channels)
+        self.channels = [pygame.mixer.Channel(i) for i in range(channels)]
+        self.voices = [(0, 0.0)] * channels
+        for name, (path, priority) in EFFECTS.items():
+            if not os.path.exists(path):
+                print(f"Sound file not found: {path}")
+                continue
+            try:
+                self.effects[name] = (pygame.mixer.Sound(path), priority)
+            except pygame.error as e:
+                print(f"Error loading {name} sound: {e}")
+
+    def on_level_event(self, level, event):
+        """Level observer hook."""
+        if event in ("start", "reset"):
+            self.play_music(level.name)
+            if event == "start":
+                self.prefetch_next(level)
+        elif event in ("unlock", "death"):
+            self.play(event)
+
+    def play(self, name):
+        """Play an effect, stealing the oldest lower-or-equal priority voice if every channel is busy."""
+        effect = self.effects.get(name)
+        if effect is None:
+            return
+        sound, priority = effect
+        target = None
+        for i, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                target = i
+                break
+        if target is None:
+            # Voice stealing: lowest priority first, then the one that has played longest
+            candidates = [i for i, (p, _) in enumerate(self.voices) if p <= priority]
+            if not candidates:
+                return
+            target = min(candidates, key=lambda i: self.voices[i])
+        try:
+            self.channels[target].play(sound)
+            self.voices[target] = (priority, time.monotonic())
+        except pygame.error as e:
+            print(f"Error playing {name} sound: {e}")
+
+    def track_for(self, name):
+        """Return the music path for a level name, resolved once and cached."""
+        if name not in self.track_paths:
+            path = None
+            # Extract level number from name (e.g., "Level 1 - The Beginning" -> 1)
+            level_match = re.search(r'Level\s+(\d+)', name)
+            if level_match:
+                path = f"assets/sounds/Level {level_match.group(1)}.wav"
+                if not os.path.exists(path):
+                    print(f"Sound file not found: {path}")
+                    path = None
+            self.track_paths[name] = path
+        return self.track_paths[name]
+
+    def _read_track(self, path):
+        """Read a track into memory (runs on the prefetch thread)."""
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            print(f"Error prefetching sound file {path}: {e}")
+            return
+        with self.tracks_lock:
+            self.tracks[path] = data
+            while len(self.tracks) > self.max_tracks:
+                self.tracks.popitem(last=False)
+
+    def prefetch(self, name):
+        """Start reading a level's track on a background thread."""
+        if not self.enabled:
+            return
+        path = self.track_for(name)
+        with self.tracks_lock:
+            if path is None or path in self.tracks:
+                return
+        threading.Thread(target=self._read_track, args=(path,), daemon=True).start()
+
+    def prefetch_next(self, level):
+        """Prefetch the track of the level after this one, if the level list is known."""
+        index = getattr(level, "index", None)
+        if self.levels is not None and index is not None and index + 1 < len(self.levels):
+            self.prefetch(self.levels[index + 1]['name'])
+
+    def play_music(self, name):
+        """Play a level's track from the start, loading it from memory when prefetched."""
+        if not self.enabled:
+            return
+        path = self.track_for(name)
+        if path is None:
+            return
+        try:
+            if path != self.current_track:
+                pygame.mixer.music.stop()
+                with self.tracks_lock:
+                    data = self.tracks.get(path)
+                    if data is not None:
+                        self.tracks.move_to_end(path)
+                if data is not None:
+                    # pygame streams from the file object, so keep it alive while playing
+                    self.current_stream = io.BytesIO(data)
+                    pygame.mixer.music.load(self.current_stream, os.path.splitext(path)[1][1:])
+                else:
+                    self.current_stream = None
+                    pygame.mixer.music.load(path)
+                pygame.mixer.music.set_volume(0.7)  # Set volume (0.0 to 1.0)
+                self.current_track = path
+            pygame.mixer.music.play(0)  # 0 means play once
+        except pygame.error as e:
+            print(f"Error loading sound file {path}: {e}")
+            self.current_track = None
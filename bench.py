@@ -0,0 +1,211 @@
+import os
+
+# Run headless: SDL's dummy drivers need no display or sound card
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import pygame
+from level import Level
+from generator import generate_level
+
+BOUNDS = 800
+# Generated level sizes: (maze cells per side, doors, dragons)
+SIZES = [(4, 1, 1), (8, 2, 4), (16, 3, 16), (24, 3, 48)]
+
+def measure(func, repeat=5, min_time=0.05, setup=None):
+    """
+    Return the best seconds per call of func over repeat runs, auto-scaling the
+    loop count. setup, if given, runs untimed before every call.
+    """
+    def run(number):
+        if setup is None:
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            return time.perf_counter() - start
+        elapsed = 0.0
+        for _ in range(number):
+            setup()
+            start = time.perf_counter()
+            func()
+            elapsed += time.perf_counter() - start
+        return elapsed
+
+    number = 1
+    while True:
+        elapsed = run(number)
+        if elapsed >= min_time:
+            break
+        number *= 2
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        samples.append(run(number) / number)
+    return min(samples)
+
+def bench_collision(config):
+    """Wall.check_collision throughput and the broad-phase grid query, per test."""
+    level = Level(0, 0, BOUNDS, BOUNDS, config)
+    rng = random.Random(1)
+    points = [(rng.uniform(0, BOUNDS), rng.uniform(0, BOUNDS)) for _ in range(200)]
+    radius = level.size / 2
+    walls = level.walls
+
+    def scan():
+        for x, y in points:
+            for wall in walls:
+                wall.check_collision(x, y, radius)
+
+    def grid():
+        for x, y in points:
+            level.collision_grid.collides(x, y, radius)
+
+    return {
+        "wall_check_collision": measure(scan) / (len(points) * len(walls)),
+        "grid_collides": measure(grid) / len(points),
+    }
+
+def bench_movement(config, frames=120):
+    """
+    Player.moveTowards and Dragon.moveTowards against the level's walls, and a
+    whole Level.step (keys, player, flow field, dragons) per frame.
+    """
+    level = Level(0, 0, BOUNDS, BOUNDS, config)
+    rng = random.Random(2)
+    targets = [(rng.uniform(0, BOUNDS), rng.uniform(0, BOUNDS)) for _ in range(frames // 30 + 1)]
+    radius = level.size / 2
+    bounds = (radius, radius, BOUNDS - radius, BOUNDS - radius)
+
+    def player():
+        level.reset()
+        for frame in range(frames):
+            level.player.moveTowards(*targets[frame // 30], *bounds, level.collision_grid)
+
+    def dragons():
+        level.reset()
+        for frame in range(frames):
+            x, y = targets[frame // 30]
+            for dragon in level.dragons:
+                dragon.moveTowards(x, y, *bounds, level.collision_grid)
+
+    def step():
+        level.reset()
+        for frame in range(frames):
+            level.step(*targets[frame // 30])
+
+    return {
+        "player_move": measure(player, repeat=3) / frames,
+        "dragons_move": measure(dragons, repeat=3) / frames,
+        "level_step": measure(step, repeat=3) / frames,
+    }
+
+def bench_lifecycle(config):
+    """Level construction and reset cost; each reset starts from a played level."""
+    level = Level(0, 0, BOUNDS, BOUNDS, config)
+
+    def play():
+        # Every key collected, every door open and the dragons moved, as at a death late in the level
+        for key in level.keys:
+            key.collected = True
+        for door in level.doors:
+            if not door.unlocked:
+                door.unlocked = True
+                level.collision_grid.remove(door)
+                if level.nav:
+                    level.nav.update_door(door)
+        for dragon in level.dragons:
+            dragon.x, dragon.y = level.player.x, level.player.y
+
+    return {
+        "level_init": measure(lambda: Level(0, 0, BOUNDS, BOUNDS, config)),
+        "level_reset": measure(level.reset, setup=play),
+    }
+
+def bench_draw(config, screen, font):
+    """Full-frame Level.draw and the per-frame sprite pass on an offscreen surface."""
+    level = Level(0, 0, BOUNDS, BOUNDS, config)
+    surface = pygame.Surface(screen.get_size())
+
+    def full():
+        surface.fill("black")
+        level.draw(surface, font)
+
+    return {
+        "level_draw": measure(full),
+        "level_draw_dynamic": measure(lambda: level.draw_dynamic(surface)),
+    }
+
+def run_suite(sizes=SIZES):
+    pygame.init()
+    screen = pygame.display.set_mode((BOUNDS, BOUNDS))
+    font = pygame.font.Font("assets/fonts/Firlest-Regular.otf", 48)
+    results = {}
+    for cells, doors, dragons in sizes:
+        # Loops (braid) give the dragons more than one way round
+        config = generate_level(0, cells=cells, doors=doors, dragons=dragons, braid=0.2)
+        label = f"{cells}x{cells}/{dragons}d/{len(config['walls'])}w"
+        for bench in (bench_collision, bench_movement, bench_lifecycle):
+            for name, seconds in bench(config).items():
+                results[f"{name}[{label}]"] = seconds
+        for name, seconds in bench_draw(config, screen, font).items():
+            results[f"{name}[{label}]"] = seconds
+    pygame.quit()
+    return results
+
+def compare(results, baseline, threshold):
+    """Print each result next to the baseline; return the names that regressed past threshold."""
+    regressions = []
+    for name, seconds in results.items():
+        base = baseline.get(name)
+        if base:
+            ratio = seconds / base
+            flag = "REGRESSION" if ratio > 1 + threshold else ("faster" if ratio < 1 - threshold else "")
+            if flag == "REGRESSION":
+                regressions.append(name)
+            print(f"{name:<48} {seconds * 1e6:12.2f} us  x{ratio:5.2f} {flag}")
+        else:
+            print(f"{name:<48} {seconds * 1e6:12.2f} us  (no baseline)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the simulation and render hot paths.")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", default="bench_baseline.json", help="stored baseline to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before flagging (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results = run_suite()
+    report = {
+        "python": sys.version.split()[0],
+        "pygame": pygame.version.ver,
+        "machine": platform.machine(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) slower than baseline by more than {args.threshold:.0%}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
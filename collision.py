@@ -0,0 +1,288 @@
+import math
+from profiler import profiler
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Below this many point/segment tests the plain Python loop beats NumPy's call overhead
+NUMPY_MIN_TESTS = 32
+# Sweeps do more work per segment, so NumPy pays off later than for point tests
+NUMPY_MIN_SWEEPS = 96
+# A circle already touching a segment is only blocked when moving into it by more than this (relative) amount
+APPROACH_EPSILON = 1e-6
+
+def sweep_segment(x1, y1, dx, dy, len_sq, x, y, move_x, move_y, radius):
+    """
+    Time of impact of a circle at (x, y) moving by (move_x, move_y) against the
+    segment starting at (x1, y1) with direction (dx, dy). This is a ray test
+    against the capsule around the segment: both flat sides plus the rounded
+    ends. Returns t in [0, 1], or None if the move is clear. A circle that
+    already overlaps the segment gets t = 0 when moving further in and None
+    when moving away, so it can always back out.
+    """
+    to_x = x - x1
+    to_y = y - y1
+    radius_sq = radius * radius
+    t = 0.0 if len_sq < 0.0001 else max(0, min(1, (to_x * dx + to_y * dy) / len_sq))
+    off_x = to_x - t * dx
+    off_y = to_y - t * dy
+    off_sq = off_x * off_x + off_y * off_y
+    move_sq = move_x * move_x + move_y * move_y
+    if off_sq < radius_sq:
+        approach = off_x * move_x + off_y * move_y
+        return 0.0 if approach < -APPROACH_EPSILON * math.sqrt(off_sq * move_sq) else None
+    if move_sq == 0:
+        return None
+    # Too far away to reach within this move
+    reach = radius + math.sqrt(move_sq)
+    if off_sq >= reach * reach:
+        return None
+
+    best = None
+    # Flat sides: the segment line pushed out by radius on the side the circle is on
+    if len_sq >= 0.0001:
+        length = math.sqrt(len_sq)
+        normal_x = -dy / length
+        normal_y = dx / length
+        side = to_x * normal_x + to_y * normal_y
+        closing = move_x * normal_x + move_y * normal_y
+        if side < 0:
+            side, closing = -side, -closing
+        if closing < 0:
+            t = (side - radius) / -closing
+            if 0 <= t <= 1:
+                along = ((to_x + t * move_x) * dx + (to_y + t * move_y) * dy) / len_sq
+                if 0 <= along <= 1:
+                    best = t
+    # Rounded ends: circle of radius around each endpoint
+    for end_x, end_y in ((to_x, to_y), (to_x - dx, to_y - dy)):
+        b = end_x * move_x + end_y * move_y
+        if b >= 0:
+            continue
+        disc = b * b - move_sq * (end_x * end_x + end_y * end_y - radius_sq)
+        if disc < 0:
+            continue
+        t = (-b - math.sqrt(disc)) / move_sq
+        if 0 <= t <= 1 and (best is None or t < best):
+            best = t
+    return best
+
+def contact_normal(x1, y1, dx, dy, len_sq, x, y, move_x, move_y):
+    """Unit normal pointing from the segment towards a circle touching it at (x, y)."""
+    to_x = x - x1
+    to_y = y - y1
+    t = 0.0 if len_sq < 0.0001 else max(0, min(1, (to_x * dx + to_y * dy) / len_sq))
+    normal_x = to_x - t * dx
+    normal_y = to_y - t * dy
+    length = math.sqrt(normal_x * normal_x + normal_y * normal_y)
+    if length == 0:
+        # Centre exactly on the segment: push straight back along the move
+        normal_x, normal_y = -move_x, -move_y
+        length = math.sqrt(normal_x * normal_x + normal_y * normal_y) or 1.0
+    return normal_x / length, normal_y / length
+
+class SegmentArray:
+    """
+    All wall/door segments of a level stored as contiguous arrays
+    (x1, y1, dx, dy, length squared) for batch circle-vs-segment tests.
+    Uses NumPy when it is installed and falls back to pure Python otherwise.
+    """
+    def __init__(self, segments=()):
+        self.segments = []
+        self.index = {}
+        self.x1 = []
+        self.y1 = []
+        self.dx = []
+        self.dy = []
+        self.len_sq = []
+        self.active = []
+        self._packed = None
+        for segment in segments:
+            self.add(segment)
+
+    def __len__(self):
+        return len(self.segments)
+
+    def add(self, segment):
+        """Append a segment (Wall or Door) and return its index."""
+        i = len(self.segments)
+        self.segments.append(segment)
+        self.index[id(segment)] = i
+        dx = segment.x2 - segment.x1
+        dy = segment.y2 - segment.y1
+        self.x1.append(segment.x1)
+        self.y1.append(segment.y1)
+        self.dx.append(dx)
+        self.dy.append(dy)
+        self.len_sq.append(dx * dx + dy * dy)
+        self.active.append(True)
+        self._packed = None
+        return i
+
+    def index_of(self, segment):
+        return self.index[id(segment)]
+
+    def set_active(self, i, active):
+        """Enable or disable a segment (e.g. a door that has been unlocked)."""
+        self.active[i] = active
+
+    def _arrays(self):
+        """Return the NumPy arrays, packing them on first use after a change."""
+        if self._packed is None:
+            self._packed = (
+                np.array(self.x1, dtype=np.float64),
+                np.array(self.y1, dtype=np.float64),
+                np.array(self.dx, dtype=np.float64),
+                np.array(self.dy, dtype=np.float64),
+                np.array(self.len_sq, dtype=np.float64),
+            )
+        return self._packed
+
+    def _hit(self, i, x, y, radius_sq):
+        """Pure-Python circle-vs-segment test, same math as Wall.check_collision."""
+        to_x = x - self.x1[i]
+        to_y = y - self.y1[i]
+        len_sq = self.len_sq[i]
+        if len_sq < 0.0001:
+            return to_x * to_x + to_y * to_y < radius_sq
+        dx = self.dx[i]
+        dy = self.dy[i]
+        t = max(0, min(1, (to_x * dx + to_y * dy) / len_sq))
+        dist_x = to_x - t * dx
+        dist_y = to_y - t * dy
+        return dist_x * dist_x + dist_y * dist_y < radius_sq
+
+    def collides(self, x, y, radius, indices=None):
+        """Return True if a circle at (x, y) hits any active segment."""
+        return self.collides_many([(x, y)], radius, indices)[0]
+
+    def collides_many(self, points, radius, indices=None):
+        """
+        Test N candidate positions against the segments in one call.
+        points is a sequence of (x, y); indices optionally limits the test
+        to a subset of segments (e.g. the result of a broad-phase query).
+        Returns a list of booleans, one per point.
+        """
+        if indices is None:
+            indices = range(len(self.segments))
+        indices = [i for i in indices if self.active[i]]
+        if not indices:
+            return [False] * len(points)
+        profiler.count("collision_tests", len(indices) * len(points))
+        radius_sq = radius * radius
+
+        if np is None or len(indices) * len(points) < NUMPY_MIN_TESTS:
+            results = []
+            for x, y in points:
+                hit = False
+                for i in indices:
+                    if self._hit(i, x, y, radius_sq):
+                        hit = True
+                        break
+                results.append(hit)
+            return results
+
+        x1, y1, dx, dy, len_sq = self._arrays()
+        idx = np.asarray(indices)
+        x1 = x1[idx]
+        y1 = y1[idx]
+        dx = dx[idx]
+        dy = dy[idx]
+        len_sq = len_sq[idx]
+        pts = np.asarray(points, dtype=np.float64)
+        # Shape (N points, M segments)
+        to_x = pts[:, 0:1] - x1
+        to_y = pts[:, 1:2] - y1
+        safe_len_sq = np.where(len_sq < 0.0001, 1.0, len_sq)
+        t = np.clip((to_x * dx + to_y * dy) / safe_len_sq, 0.0, 1.0)
+        # Point-like segments test distance to their start point
+        t = np.where(len_sq < 0.0001, 0.0, t)
+        dist_x = to_x - t * dx
+        dist_y = to_y - t * dy
+        hits = (dist_x * dist_x + dist_y * dist_y) < radius_sq
+        return hits.any(axis=1).tolist()
+
+    def sweep(self, x, y, move_x, move_y, radius, indices=None):
+        """
+        Sweep a circle from (x, y) by (move_x, move_y) against the active
+        segments. Returns (time of impact in [0, 1], normal x, normal y) for
+        the first segment hit, or None if the whole move is clear.
+        """
+        if indices is None:
+            indices = range(len(self.segments))
+        indices = [i for i in indices if self.active[i]]
+        if not indices:
+            return None
+        profiler.count("collision_tests", len(indices))
+
+        if np is None or len(indices) < NUMPY_MIN_SWEEPS:
+            best = None
+            for i in indices:
+                t = sweep_segment(self.x1[i], self.y1[i], self.dx[i], self.dy[i], self.len_sq[i],
+                                  x, y, move_x, move_y, radius)
+                if t is not None and (best is None or t < best[0]):
+                    best = (t, i)
+                    if t == 0:
+                        break
+        else:
+            best = self._sweep_numpy(indices, x, y, move_x, move_y, radius)
+        if best is None:
+            return None
+        t, i = best
+        normal = contact_normal(self.x1[i], self.y1[i], self.dx[i], self.dy[i], self.len_sq[i],
+                                x + t * move_x, y + t * move_y, move_x, move_y)
+        return t, normal[0], normal[1]
+
+    def _sweep_numpy(self, indices, x, y, move_x, move_y, radius):
+        """sweep_segment over many segments at once; returns (t, index) of the first hit or None."""
+        x1, y1, dx, dy, len_sq = self._arrays()
+        idx = np.asarray(indices)
+        x1 = x1[idx]
+        y1 = y1[idx]
+        dx = dx[idx]
+        dy = dy[idx]
+        len_sq = len_sq[idx]
+        radius_sq = radius * radius
+        move_sq = move_x * move_x + move_y * move_y
+        point = len_sq < 0.0001
+        safe_len_sq = np.where(point, 1.0, len_sq)
+        to_x = x - x1
+        to_y = y - y1
+        t = np.where(point, 0.0, np.clip((to_x * dx + to_y * dy) / safe_len_sq, 0.0, 1.0))
+        off_x = to_x - t * dx
+        off_y = to_y - t * dy
+        off_sq = off_x * off_x + off_y * off_y
+        overlap = off_sq < radius_sq
+        approach = off_x * move_x + off_y * move_y
+        blocked = approach < -APPROACH_EPSILON * np.sqrt(off_sq * move_sq)
+        toi = np.full(len(indices), np.inf)
+
+        if move_sq > 0:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                # Flat sides
+                length = np.sqrt(safe_len_sq)
+                normal_x = -dy / length
+                normal_y = dx / length
+                side = to_x * normal_x + to_y * normal_y
+                closing = move_x * normal_x + move_y * normal_y
+                closing = np.where(side < 0, -closing, closing)
+                side = np.abs(side)
+                t = (side - radius) / -closing
+                along = ((to_x + t * move_x) * dx + (to_y + t * move_y) * dy) / safe_len_sq
+                hit = (~point) & (closing < 0) & (t >= 0) & (t <= 1) & (along >= 0) & (along <= 1)
+                toi = np.where(hit, t, toi)
+                # Rounded ends
+                for end_x, end_y in ((to_x, to_y), (to_x - dx, to_y - dy)):
+                    b = end_x * move_x + end_y * move_y
+                    disc = b * b - move_sq * (end_x * end_x + end_y * end_y - radius_sq)
+                    t = (-b - np.sqrt(np.maximum(disc, 0.0))) / move_sq
+                    hit = (b < 0) & (disc >= 0) & (t >= 0) & (t <= 1)
+                    toi = np.where(hit & (t < toi), t, toi)
+
+        toi = np.where(overlap, np.where(blocked, 0.0, np.inf), toi)
+        first = int(np.argmin(toi))
+        if not np.isfinite(toi[first]):
+            return None
+        return float(toi[first]), indices[first]
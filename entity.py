@@ -1,7 +1,15 @@
 import pygame
 import math
+from array import array
+from assets import assets
+from collision import sweep_segment, contact_normal
+
+# Distance (pixels) a moving circle stops short of the wall it hits
+SKIN = 0.01
 
 class Wall:
+    __slots__ = ("x1", "y1", "x2", "y2")
+
     def __init__(self, x1, y1, x2, y2):
         self.x1 = x1
         self.y1 = y1
@@ -44,20 +52,144 @@ class Wall:
         
         return dist < player_radius
 
-class Player:
-    def __init__(self, x, y, size, speed):
+    def sweep(self, x, y, move_x, move_y, radius):
+        """
+        Sweep a circle from (x, y) by (move_x, move_y) against this wall.
+        Returns (time of impact in [0, 1], normal x, normal y) or None if the move is clear.
+        """
+        dx = self.x2 - self.x1
+        dy = self.y2 - self.y1
+        len_sq = dx * dx + dy * dy
+        t = sweep_segment(self.x1, self.y1, dx, dy, len_sq, x, y, move_x, move_y, radius)
+        if t is None:
+            return None
+        return (t,) + contact_normal(self.x1, self.y1, dx, dy, len_sq,
+                                     x + t * move_x, y + t * move_y, move_x, move_y)
+
+def sweep(walls, x, y, move_x, move_y, radius):
+    """
+    Sweep a circle against a collection of walls (list or SpatialGrid).
+    Returns (time of impact, normal x, normal y) for the first wall hit, or None.
+    """
+    if hasattr(walls, 'sweep'):
+        return walls.sweep(x, y, move_x, move_y, radius)
+    first = None
+    for wall in walls:
+        hit = wall.sweep(x, y, move_x, move_y, radius)
+        if hit is not None and (first is None or hit[0] < first[0]):
+            first = hit
+    return first
+
+def slide(walls, x, y, move_x, move_y, radius, iterations=3):
+    """
+    Move a circle by (move_x, move_y), stopping at the first wall it would hit
+    and sliding along that wall with the rest of the move. Works at any speed
+    since the whole path is swept, not just the destination. Returns the new (x, y).
+    """
+    for _ in range(iterations):
+        length = math.sqrt(move_x * move_x + move_y * move_y)
+        if length < 1e-9:
+            break
+        hit = sweep(walls, x, y, move_x, move_y, radius)
+        if hit is None:
+            return x + move_x, y + move_y
+        toi, normal_x, normal_y = hit
+        travel = max(0.0, toi - SKIN / length)
+        x += move_x * travel
+        y += move_y * travel
+        move_x *= 1 - travel
+        move_y *= 1 - travel
+        # Drop the part of the remaining move that goes into the wall
+        into = move_x * normal_x + move_y * normal_y
+        if into < 0:
+            move_x -= into * normal_x
+            move_y -= into * normal_y
+    return x, y
+
+class Sprite:
+    """
+    Base for image-backed entities. The image is only fetched from the asset
+    cache the first time it is drawn, so entities can be built headless.
+    Rotating sprites turn to face their movement using pre-rendered frames.
+    """
+    __slots__ = ("x", "y", "size", "prev_x", "prev_y", "facing", "_image", "_frames", "rect")
+    image_path = None
+    rotates = False
+    # Direction the source art faces, in degrees counterclockwise from +x
+    image_angle = 0
+    # Flip instead of turning upside down (for side-on art)
+    mirror = False
+    # Degrees a mirrored sprite may lean off horizontal; None turns it all the way round
+    max_tilt = None
+
+    def __init__(self, x, y, size):
         self.x = x
         self.y = y
         self.size = size
-        self.speed = speed
+        # Position at the previous simulation step, for render interpolation
+        self.prev_x = x
+        self.prev_y = y
+        self.facing = self.image_angle
+        self._image = None
+        self._frames = None
+        self.rect = pygame.Rect(0, 0, int(size), int(size))
+        self.rect.center = (self.x, self.y)
 
-        self.image = pygame.image.load(r"assets/images/knight.png")
-        self.image = pygame.transform.scale(self.image, (self.size, self.size))
-        self.rect = self.image.get_rect()
+    @property
+    def image(self):
+        if self._image is None:
+            self._image = assets.image(self.image_path, self.size)
+        return self._image
 
-    def draw(self, screen):
-        self.rect.center = (self.x, self.y)
-        screen.blit(self.image, self.rect)
+    def face(self, dx, dy):
+        """Turn to face a movement vector (screen coordinates, y down)."""
+        if abs(dx) > 1e-6 or abs(dy) > 1e-6:
+            self.facing = math.degrees(math.atan2(-dy, dx))
+
+    def frame(self):
+        """The image to draw: the pre-rendered rotation nearest the facing direction."""
+        if not self.rotates:
+            return self.image
+        if self._frames is None:
+            self._frames = assets.rotations(self.image_path, self.size, mirror=self.mirror)
+        steps = len(self._frames)
+        angle = (self.facing - self.image_angle + 180) % 360 - 180
+        if self.max_tilt is not None:
+            # Face right or (mirrored) left, only leaning towards the rest of the movement
+            if abs(angle) <= 90:
+                angle = min(max(angle, -self.max_tilt), self.max_tilt)
+            else:
+                lean = angle - 180 if angle > 0 else angle + 180
+                angle = 180 + min(max(lean, -self.max_tilt), self.max_tilt)
+        return self._frames[round(angle * steps / 360) % steps]
+
+    def settle(self):
+        """Mark the current position as the previous one (after a step or a teleport)."""
+        self.prev_x = self.x
+        self.prev_y = self.y
+
+    def interpolated(self, alpha):
+        """Position blended between the previous and current step; alpha 1 is the current one."""
+        return (self.prev_x + (self.x - self.prev_x) * alpha,
+                self.prev_y + (self.y - self.prev_y) * alpha)
+
+class Player(Sprite):
+    __slots__ = ("speed",)
+    image_path = "assets/images/knight.png"
+    rotates = True
+    # The helmet is seen from the front: it stays upright, flips to face left and
+    # only leans a little, so it never lies on its side or turns upside down
+    mirror = True
+    max_tilt = 20
+
+    def __init__(self, x, y, size, speed):
+        super().__init__(x, y, size)
+        self.speed = speed
+
+    def draw(self, screen, alpha=1.0):
+        image = self.frame()
+        self.rect = image.get_rect(center=self.interpolated(alpha))
+        screen.blit(image, self.rect)
 
     def moveTowards(self, x, y, left, top, right, bottom, walls=None):
         if walls is None:
@@ -75,70 +207,29 @@ class Player:
         new_x = min(max(left, new_x), right)
         new_y = min(max(top, new_y), bottom)
         
-        # Check wall collisions
-        player_radius = self.size / 2
+        # Sweep the whole step so fast moves can't tunnel through thin walls
         if walls:
-            # Check if the new position would collide with any wall
-            collision = False
-            for wall in walls:
-                if wall.check_collision(new_x, new_y, player_radius):
-                    collision = True
-                    break
-            
-            if collision:
-                # Try moving only in X direction
-                test_x = new_x
-                test_y = self.y
-                x_collision = False
-                for wall in walls:
-                    if wall.check_collision(test_x, test_y, player_radius):
-                        x_collision = True
-                        break
-                
-                # Try moving only in Y direction
-                test_x = self.x
-                test_y = new_y
-                y_collision = False
-                for wall in walls:
-                    if wall.check_collision(test_x, test_y, player_radius):
-                        y_collision = True
-                        break
-                
-                # If X direction is clear, allow X movement
-                if not x_collision:
-                    self.x = new_x
-                
-                # If Y direction is clear, allow Y movement
-                if not y_collision:
-                    self.y = new_y
-            else:
-                # No collision, move normally
-                self.x = new_x
-                self.y = new_y
-        else:
-            # No walls, move normally
-            self.x = new_x
-            self.y = new_y
+            new_x, new_y = slide(walls, self.x, self.y, new_x - self.x, new_y - self.y, self.size / 2)
+            new_x = min(max(left, new_x), right)
+            new_y = min(max(top, new_y), bottom)
+        self.face(new_x - self.x, new_y - self.y)
+        self.x = new_x
+        self.y = new_y
 
     def touchingExit(self, exit):
         return abs(self.x - exit.x) < self.size and abs(self.y - exit.y) < self.size
 
-class Exit:
-    def __init__(self, x, y, size):
-        self.x = x
-        self.y = y
-        self.size = size
-
-        self.image = pygame.image.load(r"assets/images/doorway.png")
-        self.image = pygame.transform.scale(self.image, (self.size, self.size))
-        self.rect = self.image.get_rect()
-        self.rect.center = (self.x, self.y)
+class Exit(Sprite):
+    __slots__ = ()
+    image_path = "assets/images/doorway.png"
 
     def draw(self, screen):
         screen.blit(self.image, self.rect)
 
 class Door(Wall):
     """A door that acts as a wall but can be removed when the key is collected."""
+    __slots__ = ("door_id", "unlocked")
+
     def __init__(self, x1, y1, x2, y2, door_id=1):
         super().__init__(x1, y1, x2, y2)
         self.door_id = door_id
@@ -149,19 +240,15 @@ class Door(Wall):
         if not self.unlocked:
             super().draw(screen, color, thickness)
 
-class Key:
+class Key(Sprite):
+    __slots__ = ("key_id", "collected")
+    image_path = "assets/images/key.png"
+
     def __init__(self, x, y, size, key_id=1):
-        self.x = x
-        self.y = y
-        self.size = size
+        super().__init__(x, y, size)
         self.key_id = key_id
         self.collected = False
 
-        self.image = pygame.image.load(r"assets/images/key.png")
-        self.image = pygame.transform.scale(self.image, (self.size, self.size))
-        self.rect = self.image.get_rect()
-        self.rect.center = (self.x, self.y)
-
     def draw(self, screen):
         """Draw the key image."""
         if not self.collected:
@@ -175,156 +262,191 @@ class Key:
         distance = math.sqrt((player_x - self.x) ** 2 + (player_y - self.y) ** 2)
         return distance < (self.size / 2 + player_size / 2)
 
-class Dragon:
+def steer(x, y, target_x, target_y, speed, radius, left, top, right, bottom, walls):
+    """
+    One dragon step from (x, y) towards a target, kept radius inside the
+    bounds and sliding along walls it runs into. Returns the new position,
+    or None when the target is already within one step.
+    """
+    distance = math.sqrt(math.pow(x - target_x, 2) + math.pow(y - target_y, 2))
+    if distance < speed:
+        return None
+    
+    # Calculate desired movement direction
+    dx = target_x - x
+    dy = target_y - y
+    dir_length = math.sqrt(dx * dx + dy * dy)
+    if dir_length > 0:
+        dx = dx / dir_length
+        dy = dy / dir_length
+    
+    # Calculate desired movement, clamped to the boundaries
+    new_x = min(max(left + radius, x + speed * dx), right - radius)
+    new_y = min(max(top + radius, y + speed * dy), bottom - radius)
+    
+    # Sweep the whole step and slide along whatever wall it hits
+    if walls:
+        new_x, new_y = slide(walls, x, y, new_x - x, new_y - y, radius)
+        new_x = min(max(left + radius, new_x), right - radius)
+        new_y = min(max(top + radius, new_y), bottom - radius)
+    return new_x, new_y
+
+class Dragon(Sprite):
+    __slots__ = ("speed",)
+    image_path = "assets/images/spiked-dragon-head.png"
+    rotates = True
+    mirror = True
+
     def __init__(self, x, y, size, speed):
-        self.x = x
-        self.y = y
-        self.size = size
+        super().__init__(x, y, size)
         self.speed = speed
 
-        self.image = pygame.image.load(r"assets/images/spiked-dragon-head.png")
-        self.image = pygame.transform.scale(self.image, (self.size, self.size))
-        self.rect = self.image.get_rect()
-
-    def draw(self, screen):
-        self.rect.center = (self.x, self.y)
-        screen.blit(self.image, self.rect)
+    def draw(self, screen, alpha=1.0):
+        image = self.frame()
+        self.rect = image.get_rect(center=self.interpolated(alpha))
+        screen.blit(image, self.rect)
 
     def moveTowards(self, target_x, target_y, left, top, right, bottom, walls=None):
-        """Move the dragon towards a target position with improved wall collision handling."""
-        if walls is None:
-            walls = []
-        
-        distance = math.sqrt(math.pow(self.x - target_x, 2) + math.pow(self.y - target_y, 2))
-        if distance < self.speed:
+        """Move the dragon towards a target position, sliding along walls it runs into."""
+        moved = steer(self.x, self.y, target_x, target_y, self.speed, self.size / 2,
+                      left, top, right, bottom, walls)
+        if moved is None:
             return
-        
-        dragon_radius = self.size / 2
-        
-        # Calculate desired movement direction
-        dx = target_x - self.x
-        dy = target_y - self.y
-        dir_length = math.sqrt(dx * dx + dy * dy)
-        if dir_length > 0:
-            dx = dx / dir_length
-            dy = dy / dir_length
-        
-        # Calculate desired movement
-        new_x = self.x + self.speed * dx
-        new_y = self.y + self.speed * dy
-        
-        # Clamp to boundaries first
-        new_x = min(max(left + dragon_radius, new_x), right - dragon_radius)
-        new_y = min(max(top + dragon_radius, new_y), bottom - dragon_radius)
-        
-        # Check wall collisions
-        if walls:
-            # Check if the new position would collide with any wall
-            collision = False
-            for wall in walls:
-                if wall.check_collision(new_x, new_y, dragon_radius):
-                    collision = True
-                    break
-            
-            if collision:
-                # Try moving only in X direction
-                test_x = new_x
-                test_y = self.y
-                x_collision = False
-                for wall in walls:
-                    if wall.check_collision(test_x, test_y, dragon_radius):
-                        x_collision = True
-                        break
-                
-                # Try moving only in Y direction
-                test_x = self.x
-                test_y = new_y
-                y_collision = False
-                for wall in walls:
-                    if wall.check_collision(test_x, test_y, dragon_radius):
-                        y_collision = True
-                        break
-                
-                moved = False
-                
-                # If X direction is clear, allow X movement
-                if not x_collision:
-                    self.x = new_x
-                    moved = True
-                
-                # If Y direction is clear, allow Y movement
-                if not y_collision:
-                    self.y = new_y
-                    moved = True
-                
-                # If still stuck, try sliding along the wall (perpendicular movement)
-                if not moved:
-                    # Try sliding perpendicular to the movement direction
-                    # Try both perpendicular directions
-                    perp_dx = -dy
-                    perp_dy = dx
-                    
-                    # Try first perpendicular direction
-                    slide_x = self.x + self.speed * perp_dx
-                    slide_y = self.y + self.speed * perp_dy
-                    slide_x = min(max(left + dragon_radius, slide_x), right - dragon_radius)
-                    slide_y = min(max(top + dragon_radius, slide_y), bottom - dragon_radius)
-                    
-                    slide_collision = False
-                    for wall in walls:
-                        if wall.check_collision(slide_x, slide_y, dragon_radius):
-                            slide_collision = True
-                            break
-                    
-                    if not slide_collision:
-                        self.x = slide_x
-                        self.y = slide_y
-                        moved = True
-                    else:
-                        # Try opposite perpendicular direction
-                        slide_x = self.x - self.speed * perp_dx
-                        slide_y = self.y - self.speed * perp_dy
-                        slide_x = min(max(left + dragon_radius, slide_x), right - dragon_radius)
-                        slide_y = min(max(top + dragon_radius, slide_y), bottom - dragon_radius)
-                        
-                        slide_collision = False
-                        for wall in walls:
-                            if wall.check_collision(slide_x, slide_y, dragon_radius):
-                                slide_collision = True
-                                break
-                        
-                        if not slide_collision:
-                            self.x = slide_x
-                            self.y = slide_y
-                            moved = True
-                
-                # If still completely stuck, try moving away from walls slightly
-                if not moved:
-                    # Try moving in reverse direction (away from target) to escape corner
-                    reverse_x = self.x - self.speed * 0.5 * dx
-                    reverse_y = self.y - self.speed * 0.5 * dy
-                    reverse_x = min(max(left + dragon_radius, reverse_x), right - dragon_radius)
-                    reverse_y = min(max(top + dragon_radius, reverse_y), bottom - dragon_radius)
-                    
-                    reverse_collision = False
-                    for wall in walls:
-                        if wall.check_collision(reverse_x, reverse_y, dragon_radius):
-                            reverse_collision = True
-                            break
-                    
-                    if not reverse_collision:
-                        self.x = reverse_x
-                        self.y = reverse_y
-            else:
-                # No collision, move normally
-                self.x = new_x
-                self.y = new_y
-        else:
-            # No walls, move normally
-            self.x = new_x
-            self.y = new_y
+        self.face(moved[0] - self.x, moved[1] - self.y)
+        self.x, self.y = moved
 
     def check_collision(self, player_x, player_y, player_size):
         """Check if the dragon is touching the player."""
         distance = math.sqrt((player_x - self.x) ** 2 + (player_y - self.y) ** 2)
-        return distance < (self.size / 2 + player_size / 2)
\ No newline at end of file
+        return distance < (self.size / 2 + player_size / 2)
+
+def _column(name):
+    """Property reading and writing one dragon's entry in a DragonSwarm array."""
+    return property(lambda view: getattr(view.swarm, name)[view.index],
+                    lambda view, value: getattr(view.swarm, name).__setitem__(view.index, value))
+
+class DragonView(Dragon):
+    """
+    A Dragon whose state lives in a DragonSwarm row. Behaves like any other
+    Dragon (move, draw, collide) but owns no storage of its own.
+    """
+    __slots__ = ("swarm", "index")
+    x = _column("x")
+    y = _column("y")
+    prev_x = _column("prev_x")
+    prev_y = _column("prev_y")
+    facing = _column("facing")
+    speed = _column("speed")
+    rect = _column("rects")
+    size = property(lambda view: view.swarm.size)
+    _image = property(lambda view: view.swarm.image,
+                      lambda view, value: None)
+    _frames = property(lambda view: view.swarm.frames(),
+                       lambda view, value: None)
+
+    def __init__(self, swarm, index):
+        self.swarm = swarm
+        self.index = index
+
+class DragonSwarm:
+    """
+    Struct-of-arrays store for a level's dragons: positions, previous
+    positions, facings and speeds live in typed arrays, and every dragon shares
+    one size and one set of pre-rendered frames. Indexing or iterating yields
+    DragonView objects, so code written against a list of Dragons keeps working.
+    """
+    __slots__ = ("size", "x", "y", "prev_x", "prev_y", "facing", "speed", "rects", "_frames")
+
+    def __init__(self, positions, size, speed):
+        self.size = size
+        self.x = array("d", (x for x, _ in positions))
+        self.y = array("d", (y for _, y in positions))
+        self.prev_x = array("d", self.x)
+        self.prev_y = array("d", self.y)
+        self.facing = array("d", [Dragon.image_angle]) * len(self.x)
+        self.speed = array("d", [speed]) * len(self.x)
+        # Screen rects of the last draw, for dirty-rectangle rendering
+        self.rects = [pygame.Rect(0, 0, int(size), int(size)) for _ in range(len(self.x))]
+        self._frames = None
+
+    def __len__(self):
+        return len(self.x)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self.x)
+        if not 0 <= i < len(self.x):
+            raise IndexError("dragon index out of range")
+        return DragonView(self, i)
+
+    def __iter__(self):
+        for i in range(len(self.x)):
+            yield DragonView(self, i)
+
+    @property
+    def image(self):
+        return assets.image(Dragon.image_path, self.size)
+
+    def frames(self):
+        """Rotation frames shared by every dragon in the swarm."""
+        if self._frames is None:
+            self._frames = assets.rotations(Dragon.image_path, self.size, mirror=Dragon.mirror)
+        return self._frames
+
+    def settle(self):
+        self.prev_x[:] = self.x
+        self.prev_y[:] = self.y
+
+    def snapshot(self):
+        return (tuple(self.x), tuple(self.y), tuple(self.facing))
+
+    def restore(self, state):
+        xs, ys, facing = state
+        self.x[:] = array("d", xs)
+        self.y[:] = array("d", ys)
+        self.facing[:] = array("d", facing)
+
+    def advance(self, flow, target_x, target_y, target_size, left, top, right, bottom, walls=None):
+        """
+        Move every dragon one step towards the target along the flow field, in
+        order, stopping at the first one that touches the target (size
+        target_size). Returns that dragon's index, or -1 if none did.
+        """
+        xs, ys, facing, speeds = self.x, self.y, self.facing, self.speed
+        radius = self.size / 2
+        reach = radius + target_size / 2
+        waypoint = flow.waypoint if flow is not None else None
+        for i in range(len(xs)):
+            x = xs[i]
+            y = ys[i]
+            point = waypoint(x, y) if waypoint is not None else None
+            if point is None:
+                point = (target_x, target_y)
+            moved = steer(x, y, point[0], point[1], speeds[i], radius, left, top, right, bottom, walls)
+            if moved is not None:
+                dx = moved[0] - x
+                dy = moved[1] - y
+                if abs(dx) > 1e-6 or abs(dy) > 1e-6:
+                    facing[i] = math.degrees(math.atan2(-dy, dx))
+                x, y = moved
+                xs[i] = x
+                ys[i] = y
+            if math.sqrt((target_x - x) ** 2 + (target_y - y) ** 2) < reach:
+                return i
+        return -1
+
+    def draw(self, screen, alpha=1.0):
+        """Draw every dragon and return the screen rects they cover."""
+        frames = self.frames()
+        steps = len(frames)
+        scale = steps / 360
+        offset = Dragon.image_angle
+        xs, ys, prev_x, prev_y, facing, rects = self.x, self.y, self.prev_x, self.prev_y, self.facing, self.rects
+        blit = screen.blit
+        for i in range(len(xs)):
+            image = frames[round((facing[i] - offset) * scale) % steps]
+            rect = image.get_rect(center=(prev_x[i] + (xs[i] - prev_x[i]) * alpha,
+                                          prev_y[i] + (ys[i] - prev_y[i]) * alpha))
+            rects[i] = rect
+            blit(image, rect)
+        return list(rects)
@@ -0,0 +1,348 @@
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import multiprocessing
+import random
+import time
+from array import array
+from collections import OrderedDict
+from multiprocessing import shared_memory
+from level import Level
+from levelpack import LevelPack, load_levels, default_levels_path
+
+# Rewards: every step costs a little so faster runs score higher
+STEP_REWARD = -0.001
+KEY_REWARD = 1.0
+EXIT_REWARD = 10.0
+DEATH_PENALTY = -5.0
+
+class ObservationLayout:
+    """
+    Shape of the fixed-length observation vector for a level list. Positions
+    are relative to the board (0-1). The vector holds the player, the exit,
+    then (x, y, collected) per key, (x1, y1, x2, y2, unlocked) per door and
+    (x, y, present) per dragon, zero-padded to the most any level has.
+    """
+    def __init__(self, levels):
+        configs = [levels[i] for i in range(len(levels))]
+        self.keys = max((len(config.get('keys', [])) for config in configs), default=0)
+        self.doors = max((len(config.get('doors', [])) for config in configs), default=0)
+        self.dragons = max((len(config.get('dragons', [])) for config in configs), default=0)
+        self.size = 4 + 3 * self.keys + 5 * self.doors + 3 * self.dragons
+
+class LevelEnv:
+    """
+    Single-agent environment over one Level at a time with a Gym-style API:
+    reset() -> (observation, info) and step((x, y)) -> (observation, reward,
+    terminated, truncated, info). Actions are target points in board
+    coordinates (0-1), the same thing the mouse position is to Level.tick().
+    An episode is one level; it ends at the exit, on death, or after max_steps.
+    """
+    def __init__(self, levels, layout=None, level=None, bounds=800, max_steps=60 * 60, seed=None, keep_levels=4):
+        self.levels = levels
+        self.layout = layout or ObservationLayout(levels)
+        # A fixed level index, or None to pick one at random on every reset
+        self.fixed_level = level
+        self.bounds = bounds
+        self.max_steps = max_steps
+        self.rng = random.Random(seed)
+        # Levels already built, recycled on reset instead of rebuilt
+        self.built = OrderedDict()
+        self.keep_levels = keep_levels
+        self.level = None
+        self.steps = 0
+        self.reward = 0.0
+        self.died = False
+
+    def on_level_event(self, level, event):
+        """Level observer hook: keys and deaths feed the reward of the current step."""
+        if event == "unlock":
+            self.reward += KEY_REWARD
+        elif event == "death":
+            self.reward += DEATH_PENALTY
+            self.died = True
+
+    def reset(self, seed=None, level=None):
+        if seed is not None:
+            self.rng.seed(seed)
+        if level is None:
+            level = self.fixed_level if self.fixed_level is not None else self.rng.randrange(len(self.levels))
+        built = self.built.pop(level, None)
+        if built is None:
+            built = Level(0, 0, self.bounds, self.bounds, self.levels[level], [self], index=level)
+            if len(self.built) >= self.keep_levels:
+                self.built.popitem(last=False)
+        else:
+            built.recycle([self])
+        self.built[level] = built
+        self.level = built
+        self.steps = 0
+        return self.observe(), {"level": level}
+
+    def advance(self, x, y):
+        """Step towards (x, y) in board coordinates; returns (reward, terminated, truncated)."""
+        level = self.level
+        self.reward = STEP_REWARD
+        self.died = False
+        reached = level.step(level.x + x * level.width, level.y + y * level.height)
+        self.steps += 1
+        if reached:
+            self.reward += EXIT_REWARD
+        terminated = reached or self.died
+        return self.reward, terminated, not terminated and self.steps >= self.max_steps
+
+    def step(self, action):
+        reward, terminated, truncated = self.advance(*action)
+        return self.observe(), reward, terminated, truncated, self.info()
+
+    def info(self):
+        return {"level": self.level.index, "steps": self.steps, "died": self.died,
+                "keys": sum(1 for key in self.level.keys if key.collected)}
+
+    def observe(self, out=None, offset=0):
+        """Return the observation, or write it into out[offset:offset + layout.size]."""
+        layout = self.layout
+        level = self.level
+        ox, oy = level.x, level.y
+        sx, sy = 1 / level.width, 1 / level.height
+        player, exit_ = level.player, level.exit
+        values = [(player.x - ox) * sx, (player.y - oy) * sy, (exit_.x - ox) * sx, (exit_.y - oy) * sy]
+        for key in level.keys:
+            values += ((key.x - ox) * sx, (key.y - oy) * sy, 1.0 if key.collected else 0.0)
+        values += [0.0] * (3 * (layout.keys - len(level.keys)))
+        for door in level.doors:
+            values += ((door.x1 - ox) * sx, (door.y1 - oy) * sy, (door.x2 - ox) * sx, (door.y2 - oy) * sy,
+                       1.0 if door.unlocked else 0.0)
+        values += [0.0] * (5 * (layout.doors - len(level.doors)))
+        dragons = level.dragons
+        for x, y in zip(dragons.x, dragons.y):
+            values += ((x - ox) * sx, (y - oy) * sy, 1.0)
+        values += [0.0] * (3 * (layout.dragons - len(dragons)))
+        observation = array('d', values)
+        if out is None:
+            return observation
+        out[offset:offset + layout.size] = observation
+
+class Buffers:
+    """Flat per-batch arrays: observations, actions (x, y pairs), rewards and done flags."""
+    def __init__(self, count, size):
+        self.count = count
+        self.size = size
+        self.observations = array('d', bytes(8 * count * size))
+        self.actions = array('d', bytes(16 * count))
+        self.rewards = array('d', bytes(8 * count))
+        self.terminated = bytearray(count)
+        self.truncated = bytearray(count)
+
+    def set_actions(self, actions):
+        """Copy actions in, given as (x, y) pairs or a flat x0, y0, x1, y1, ... sequence."""
+        if len(actions) == self.count:
+            for i, (x, y) in enumerate(actions):
+                self.actions[2 * i] = x
+                self.actions[2 * i + 1] = y
+        else:
+            self.actions[:] = array('d', actions)
+
+class SharedBuffers(Buffers):
+    """Buffers in shared memory blocks, created by the parent and attached to by name in workers."""
+    def __init__(self, count, size, names=None):
+        self.count = count
+        self.size = size
+        lengths = (8 * count * size, 16 * count, 8 * count, 2 * count)
+        if names is None:
+            self.blocks = [shared_memory.SharedMemory(create=True, size=max(1, n)) for n in lengths]
+        else:
+            self.blocks = [shared_memory.SharedMemory(name=name) for name in names]
+        self.names = [block.name for block in self.blocks]
+        # Blocks may be rounded up to a page, so cut each view to its exact length
+        raw = [block.buf[:n] for block, n in zip(self.blocks, lengths)]
+        self.views = raw + [raw[0].cast('d'), raw[1].cast('d'), raw[2].cast('d'),
+                            raw[3][:count], raw[3][count:]]
+        self.observations, self.actions, self.rewards, self.terminated, self.truncated = self.views[4:]
+
+    def close(self, unlink=False):
+        # Exported views must go before the blocks can be closed
+        for view in reversed(self.views):
+            view.release()
+        self.views = []
+        for block in self.blocks:
+            block.close()
+            if unlink:
+                block.unlink()
+
+def step_batch(envs, buffers, start=0):
+    """
+    Step envs (at batch positions start, start + 1, ...) with their actions
+    from buffers and write rewards, done flags and observations back. Finished
+    episodes are reset straight away, so their observation is the next
+    episode's first; returns {batch index: final info} for them.
+    """
+    actions = buffers.actions
+    observations = buffers.observations
+    rewards, terminated, truncated = buffers.rewards, buffers.terminated, buffers.truncated
+    size = buffers.size
+    finished = {}
+    for i, env in enumerate(envs, start):
+        reward, ended, cut = env.advance(actions[2 * i], actions[2 * i + 1])
+        rewards[i] = reward
+        terminated[i] = ended
+        truncated[i] = cut
+        if ended or cut:
+            finished[i] = env.info()
+            env.reset()
+        env.observe(observations, i * size)
+    return finished
+
+class VectorEnv:
+    """
+    count LevelEnvs stepped together in this process. step(actions) returns
+    (observations, rewards, terminated, truncated, infos) where the first four
+    are flat arrays reused every step and infos maps the index of each env
+    whose episode ended to its final info.
+    """
+    def __init__(self, levels, count, seed=None, **options):
+        self.layout = ObservationLayout(levels)
+        self.count = count
+        self.envs = [LevelEnv(levels, self.layout, seed=None if seed is None else seed + i, **options)
+                     for i in range(count)]
+        self.buffers = Buffers(count, self.layout.size)
+
+    def reset(self):
+        for i, env in enumerate(self.envs):
+            env.reset()
+            env.observe(self.buffers.observations, i * self.layout.size)
+        return self.buffers.observations
+
+    def step(self, actions):
+        buffers = self.buffers
+        buffers.set_actions(actions)
+        infos = step_batch(self.envs, buffers)
+        return buffers.observations, buffers.rewards, buffers.terminated, buffers.truncated, infos
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+def _worker(conn, source, count, start, stop, names, seed, options):
+    """Worker process: owns envs start..stop and steps them on command, sharing buffers with the parent."""
+    levels = load_levels(source) if isinstance(source, str) else source
+    layout = ObservationLayout(levels)
+    buffers = SharedBuffers(count, layout.size, names)
+    envs = [LevelEnv(levels, layout, seed=None if seed is None else seed + i, **options)
+            for i in range(start, stop)]
+    try:
+        while True:
+            command = conn.recv()
+            if command == "step":
+                conn.send(step_batch(envs, buffers, start))
+            elif command == "reset":
+                for i, env in enumerate(envs, start):
+                    env.reset()
+                    env.observe(buffers.observations, i * layout.size)
+                conn.send(None)
+            else:
+                break
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        buffers.close()
+        conn.close()
+
+class ProcessVectorEnv(VectorEnv):
+    """
+    Like VectorEnv, but the envs are split across worker processes. Actions,
+    observations, rewards and done flags live in shared memory, so a step only
+    sends one short command to each worker and gets back the finished episodes.
+    """
+    def __init__(self, levels, count, processes=None, seed=None, **options):
+        self.layout = ObservationLayout(levels)
+        self.count = count
+        self.buffers = SharedBuffers(count, self.layout.size)
+        # Packs are reopened by path in the workers rather than pickled
+        source = levels.path if isinstance(levels, LevelPack) else list(levels)
+        processes = max(1, min(count, processes or os.cpu_count()))
+        self.connections = []
+        self.workers = []
+        for w in range(processes):
+            start, stop = w * count // processes, (w + 1) * count // processes
+            parent, child = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target=_worker, daemon=True, args=(
+                child, source, count, start, stop, self.buffers.names, seed, options))
+            worker.start()
+            child.close()
+            self.connections.append(parent)
+            self.workers.append(worker)
+
+    def _broadcast(self, command):
+        for conn in self.connections:
+            conn.send(command)
+        return [conn.recv() for conn in self.connections]
+
+    def reset(self):
+        self._broadcast("reset")
+        return self.buffers.observations
+
+    def step(self, actions):
+        buffers = self.buffers
+        buffers.set_actions(actions)
+        infos = {}
+        for finished in self._broadcast("step"):
+            infos.update(finished)
+        return buffers.observations, buffers.rewards, buffers.terminated, buffers.truncated, infos
+
+    def close(self):
+        if not self.workers:
+            return
+        for conn in self.connections:
+            try:
+                conn.send("close")
+            except OSError:
+                pass
+        for worker in self.workers:
+            worker.join(timeout=5)
+        for conn in self.connections:
+            conn.close()
+        self.workers = []
+        self.buffers.close(unlink=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure environment throughput with random actions.")
+    parser.add_argument("--levels", default=None, help="levels.json or a compiled .kqp pack")
+    parser.add_argument("--envs", type=int, default=64, help="environments stepped together")
+    parser.add_argument("--processes", type=int, default=0, help="worker processes (0 = in-process)")
+    parser.add_argument("--steps", type=int, default=500, help="batched steps to run")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    levels = load_levels(args.levels or default_levels_path())
+    if args.processes:
+        env = ProcessVectorEnv(levels, args.envs, args.processes, seed=args.seed)
+    else:
+        env = VectorEnv(levels, args.envs, seed=args.seed)
+    rng = random.Random(args.seed)
+    with env:
+        env.reset()
+        episodes = 0
+        total_reward = 0.0
+        start = time.perf_counter()
+        for _ in range(args.steps):
+            actions = [rng.random() for _ in range(2 * args.envs)]
+            _, rewards, _, _, infos = env.step(actions)
+            episodes += len(infos)
+            total_reward += sum(rewards)
+        elapsed = time.perf_counter() - start
+    steps = args.steps * args.envs
+    print(f"{steps} env steps in {elapsed:.2f}s ({steps / elapsed:.0f} steps/s), "
+          f"{episodes} episodes, mean reward per step {total_reward / steps:.4f}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,72 +1,276 @@
 import pygame
-import json
+import os
+import sqlite3
 import time
-from level import Level
+from simulation import Simulation, DT
+from levelpack import load_levels, default_levels_path
+from audio import AudioManager, init_mixer
+from assets import assets
+from text import TextCache, GlyphAtlas
+from profiler import profiler
+from replay import Recorder
+from arena import Arena, EffectsOnly
+from loader import Loader
+from runs import RunStore, make_run
+
+# At most this many simulation steps run per rendered frame; past that the
+# game slows down rather than spiralling into ever longer catch-up frames
+MAX_STEPS_PER_FRAME = 5
+# Longer gaps (window drags, breakpoints) count as this much time
+MAX_FRAME_TIME = 0.25
 
 class Game:
-    def __init__(self):
+    def __init__(self, fps=60, vsync=False, arena=0, quality="smooth"):
 
         info = pygame.display.Info()
         self.screen_width = info.current_w
         self.screen_height = info.current_h
         self.bounds = min(self.screen_width, self.screen_height) * 0.8
 
-        with open("levels.json", "r") as f:
-            self.levels = json.load(f)
+        # Level data and audio arrive from the background loader; see load_levels and load_audio
+        self.levels = None
+        self.audio = None
 
-        self.level_num = 0
-        self.level = None
-        
-        self.game_font = pygame.font.Font("assets/fonts/Firlest-Regular.otf", 48)
-        self.timer_font = pygame.font.Font("assets/fonts/JetBrainsMono-SemiBold.ttf", 48)
-        self.menu_font = pygame.font.Font("assets/fonts/Firlest-Regular.otf", 72)
-        self.button_font = pygame.font.Font("assets/fonts/Firlest-Regular.otf", 56)
+        # The simulation owns the current level; audio listens to its events
+        self.simulation = None
+        # Arena mode: many bot-driven boards instead of the player's run
+        self.arena = None
+        self.arena_boards = arena
+        self.recorder = None
+        self.replay_path = None
+        # Run history: the store opens in the background; standing is the Future of the last run's rank
+        self.runs = None
+        self.run = None
+        self.standing = None
+
+        # Fonts are cheap and the menu needs them, so they load first on this thread
+        with profiler.phase("fonts"):
+            self.game_font = pygame.font.Font("assets/fonts/Firlest-Regular.otf", 48)
+            self.timer_font = pygame.font.Font("assets/fonts/JetBrainsMono-SemiBold.ttf", 48)
+            self.menu_font = pygame.font.Font("assets/fonts/Firlest-Regular.otf", 72)
+            self.button_font = pygame.font.Font("assets/fonts/Firlest-Regular.otf", 56)
+            self.completion_font = pygame.font.Font("assets/fonts/Firlest-Regular.otf", 64)
+            self.final_time_font = pygame.font.Font("assets/fonts/JetBrainsMono-SemiBold.ttf", 72)
+            self.debug_font = pygame.font.Font("assets/fonts/JetBrainsMono-SemiBold.ttf", 16)
+            self.split_font = pygame.font.Font("assets/fonts/JetBrainsMono-SemiBold.ttf", 28)
+
+        # Rendered text and translucent panels are reused across frames
+        self.text_cache = TextCache()
+        self.timer_glyphs = GlyphAtlas(self.timer_font, (255, 255, 255))
+        self.panels = {}
 
-        self.start_time = time.time()
         self.elapsed_time = 0.0
         self.final_time = 0.0
 
-        self.bg_image = pygame.image.load("assets\images\dungeon-background.jpg")
-        self.bg_image = pygame.transform.scale(self.bg_image, (self.screen_width, self.screen_height))
-        self.bg_rect = self.bg_image.get_rect()
+        # Fixed-timestep loop: real time accumulates and is spent in DT simulation steps;
+        # alpha is how far rendering is between the last two steps
+        self.fps = fps
+        self.accumulator = 0.0
+        self.alpha = 1.0
+        self.last_time = time.perf_counter()
+
+        # Images are scaled with smoothscale ("smooth") or scale ("fast")
+        assets.set_quality(quality)
 
-        self.screen = pygame.display.set_mode((self.screen_width, self.screen_height), pygame.FULLSCREEN)
+        self.screen = None
+        if vsync:
+            # SDL only honours vsync on a renderer-backed (SCALED) window
+            try:
+                self.screen = pygame.display.set_mode((self.screen_width, self.screen_height),
+                                                      pygame.FULLSCREEN | pygame.SCALED, vsync=1)
+            except pygame.error as e:
+                print(f"Vsync unavailable, falling back to a capped frame rate: {e}")
+                self.fps = self.fps or 60
+        if self.screen is None:
+            self.screen = pygame.display.set_mode((self.screen_width, self.screen_height), pygame.FULLSCREEN)
         self.clock = pygame.time.Clock()
 
+        # Loaded once the display format is known, so it blits without per-pixel conversion
+        with profiler.phase("menu background"):
+            self.load_background()
+
+        # Everything only a level needs streams in while the menu is up. Sprites
+        # are decoded after set_mode so they can be converted to the display format.
+        self.loaded = False
+        self.loader = Loader([
+            ("levels", self.load_levels),
+            ("sprites", assets.preload),
+            ("first level", self.prepare_simulation),
+            ("mixer", init_mixer),
+            ("audio", self.load_audio),
+            ("runs", self.open_runs),
+        ]).start()
+
         self.running = True
         self.active = False
         self.menu_active = True
         self.play_button_rect = None
 
+        # Dirty-rectangle rendering state for the level screen
+        self.background = None
+        self.background_key = None
+        self.dirty_rects = []
+
         pygame.display.set_caption("Knight's Quest")
 
+    def load_background(self):
+        """Fit the menu and level background to the current screen size."""
+        self.bg_image = assets.background("assets/images/dungeon-background.jpg",
+                                          (self.screen_width, self.screen_height))
+        self.bg_rect = self.bg_image.get_rect()
+
+    def resize(self, width, height):
+        """
+        Follow a change of display size: the background is rescaled from the
+        already decoded image (or the disk cache) and cached frames are dropped.
+        A level in progress keeps its placement until the next run.
+        """
+        self.screen = pygame.display.get_surface()
+        self.screen_width, self.screen_height = width, height
+        self.load_background()
+        self.background = None
+        self.background_key = None
+        self.dirty_rects = []
+
+    def load_levels(self):
+        """Loader step: levels come from a compiled pack when available, decoded lazily by index."""
+        self.levels = load_levels(default_levels_path())
+
+    def board_origin(self):
+        """Top-left corner of the level board, centred on the screen."""
+        return self.screen_width // 2 - self.bounds // 2, self.screen_height // 2 - self.bounds // 2
+
+    def prepare_simulation(self):
+        """Loader step: create the simulation and build the first level on its worker, so Play is a swap."""
+        if self.arena_boards:
+            return
+        x, y = self.board_origin()
+        simulation = Simulation(self.levels, x, y, self.bounds, preload=True)
+        simulation.preload_level(0)
+        self.simulation = simulation
+
+    def load_audio(self):
+        """Loader step: decode the sound effects and start reading the first level's music."""
+        audio = AudioManager(self.levels)
+        if len(self.levels):
+            audio.prefetch(self.levels[0]['name'])
+        self.audio = audio
+
+    def open_runs(self):
+        """Loader step: open the run history; the game still works without it."""
+        try:
+            self.runs = RunStore()
+        except sqlite3.Error as e:
+            print(f"Error opening run store: {e}")
+
+    def check_loader(self):
+        """Called every frame until the background loader is done; then the game can start."""
+        if self.loaded or not self.loader.ready:
+            return
+        self.loaded = True
+        if profiler.enabled:
+            print("\n".join(profiler.startup_report()))
+        if self.arena_boards:
+            self.start_arena(self.arena_boards)
+
     def draw(self):
+        if self.arena is not None:
+            self.draw_arena()
+            return
+        if self.active and not self.menu_active:
+            self.draw_level()
+            return
         self.screen.fill("black")
         self.screen.blit(self.bg_image, self.bg_rect)
         if self.menu_active:
             self.draw_menu()
-        elif self.active:
-            self.level.draw(self.screen, self.game_font)
-            self.draw_timer()
         else:
             self.draw_completion_screen()
-        pygame.display.flip()
+        profiler.draw_overlay(self.screen, self.debug_font)
+        with profiler.section("display.flip"):
+            pygame.display.flip()
+        # The next level frame has to repaint the whole screen
+        self.background_key = None
+
+    def draw_level(self):
+        """Draw the level, only pushing the rectangles touched by moving sprites."""
+        key = (id(self.level), self.level.static_version)
+        if key != self.background_key:
+            # Pre-render the background image and the level's static layer once
+            with profiler.section("level.draw"):
+                if self.background is None:
+                    self.background = pygame.Surface((self.screen_width, self.screen_height))
+                self.background.fill("black")
+                self.background.blit(self.bg_image, self.bg_rect)
+                self.level.draw_static(self.background, self.game_font)
+                self.background_key = key
+                self.screen.blit(self.background, (0, 0))
+                self.dirty_rects = self.level.draw_dynamic(self.screen, self.alpha)
+            self.dirty_rects.append(self.draw_timer())
+            self.draw_overlay()
+            with profiler.section("display.flip"):
+                pygame.display.flip()
+            return
+        
+        # Erase last frame's sprites by restoring the background underneath them
+        previous_rects = self.dirty_rects
+        with profiler.section("level.draw"):
+            for rect in previous_rects:
+                self.screen.blit(self.background, rect, rect)
+            self.dirty_rects = self.level.draw_dynamic(self.screen, self.alpha)
+        self.dirty_rects.append(self.draw_timer())
+        self.draw_overlay()
+        with profiler.section("display.flip"):
+            pygame.display.update(previous_rects + self.dirty_rects)
+
+    def draw_arena(self):
+        """Draw every arena board, pushing only the rectangles that changed."""
+        previous_rects = self.dirty_rects
+        if self.arena.background is not None:
+            # The profiler overlay is the only thing drawn outside the boards' own bookkeeping
+            for rect in previous_rects:
+                self.screen.blit(self.arena.background, rect, rect)
+        with profiler.section("level.draw"):
+            changed = self.arena.draw(self.screen, self.bg_image, self.alpha)
+        self.dirty_rects = []
+        self.draw_overlay()
+        with profiler.section("display.flip"):
+            pygame.display.update(previous_rects + changed + self.dirty_rects)
+
+    def draw_overlay(self):
+        """Draw the profiler overlay if it is visible and mark its area dirty."""
+        rect = profiler.draw_overlay(self.screen, self.debug_font)
+        if rect is not None:
+            self.dirty_rects.append(rect)
     
+    def panel(self, width, height, color):
+        """Return a cached translucent SRCALPHA surface of the given size and color."""
+        key = (width, height, color)
+        surface = self.panels.get(key)
+        if surface is None:
+            surface = assets.convert(pygame.Surface((width, height), pygame.SRCALPHA))
+            surface.fill(color)
+            self.panels[key] = surface
+        return surface
+
     def draw_menu(self):
         """Draw the main menu screen with a play button."""
         # Draw title
-        title_text = self.menu_font.render("Knight's Quest", True, (255, 255, 255))
+        title_text = self.text_cache.render(self.menu_font, "Knight's Quest", (255, 255, 255))
         title_rect = title_text.get_rect()
         title_rect.center = (self.screen_width // 2, self.screen_height // 2 - 150)
         
         # Draw semi-transparent background for title
-        title_bg = pygame.Surface((title_rect.width + 40, title_rect.height + 20), pygame.SRCALPHA)
-        title_bg.fill((0, 0, 0, 180))
+        title_bg = self.panel(title_rect.width + 40, title_rect.height + 20, (0, 0, 0, 180))
         self.screen.blit(title_bg, (title_rect.x - 20, title_rect.y - 10))
         self.screen.blit(title_text, title_rect)
+
+        if not self.loaded:
+            self.draw_loading()
+            return
         
         # Draw play button
-        button_text = self.button_font.render("Play", True, (255, 255, 255))
+        button_text = self.text_cache.render(self.button_font, "Play", (255, 255, 255))
         button_rect = button_text.get_rect()
         button_rect.center = (self.screen_width // 2, self.screen_height // 2 + 50)
         
@@ -89,10 +293,25 @@ class Game:
         # Store button rect for click detection
         self.play_button_rect = button_bg_rect
     
+    def draw_loading(self):
+        """Progress bar in place of the play button while the loader is still running."""
+        self.play_button_rect = None
+        bar_rect = pygame.Rect(0, 0, 400, 24)
+        bar_rect.center = (self.screen_width // 2, self.screen_height // 2 + 50)
+        if self.loader.error is not None:
+            text = self.text_cache.render(self.debug_font, "Loading failed, see the console", (255, 80, 80))
+            self.screen.blit(text, text.get_rect(center=bar_rect.center))
+            return
+        self.screen.blit(self.panel(bar_rect.width, bar_rect.height, (0, 0, 0, 180)), bar_rect)
+        filled = bar_rect.copy()
+        filled.width = int(bar_rect.width * self.loader.progress)
+        pygame.draw.rect(self.screen, (80, 120, 160), filled)
+        pygame.draw.rect(self.screen, (255, 255, 255), bar_rect, width=2)
+
     def draw_timer(self):
-        # Only update elapsed_time if game is still active
+        # Only update elapsed_time if game is still active; the timer counts simulated time
         if self.active:
-            self.elapsed_time = time.time() - self.start_time
+            self.elapsed_time = self.simulation.time
             time_to_display = self.elapsed_time
         else:
             # Game is complete - use final_time (which should be set when game completes)
@@ -101,9 +320,8 @@ class Game:
         
         time_str = self.format_time(time_to_display)
         
-        # Render timer text
-        timer_surface = self.timer_font.render(time_str, True, (255, 255, 255))
-        timer_rect = timer_surface.get_rect()
+        # Measure the timer text composed from cached digit glyphs
+        timer_rect = pygame.Rect((0, 0), self.timer_glyphs.size(time_str))
         
         # Position at top right with 10 pixels padding from corner
         timer_rect.topright = (self.screen_width - 10, 10)
@@ -113,12 +331,11 @@ class Game:
         bg_padding = 5
         bg_rect = pygame.Rect(timer_rect.left - bg_padding, timer_rect.top, 
                              timer_rect.width + bg_padding, timer_rect.height + bg_padding)
-        bg_surface = pygame.Surface((bg_rect.width, bg_rect.height), pygame.SRCALPHA)
-        bg_surface.fill((0, 0, 0, 180))
-        self.screen.blit(bg_surface, bg_rect)
+        self.screen.blit(self.panel(bg_rect.width, bg_rect.height, (0, 0, 0, 180)), bg_rect)
         
         # Draw timer text
-        self.screen.blit(timer_surface, timer_rect)
+        self.timer_glyphs.blit(self.screen, time_str, timer_rect.topleft)
+        return bg_rect
     
     def format_time(self, time_seconds):
         """Format time as HH:MM:SS.mmm or MM:SS.mmm (LiveSplit style)"""
@@ -135,19 +352,15 @@ class Game:
     def draw_completion_screen(self):
         """Draw the final completion time in the center of the screen"""
         # Draw full-screen black background with 50% transparency
-        black_surface = pygame.Surface((self.screen_width, self.screen_height), pygame.SRCALPHA)
-        black_surface.fill((0, 0, 0, 200))  # 128 = 50% of 255
+        black_surface = self.panel(self.screen_width, self.screen_height, (0, 0, 0, 200))  # 128 = 50% of 255
         self.screen.blit(black_surface, (0, 0))
         
         # Format final time
         time_str = self.format_time(self.final_time)
         
-        # Render completion text
-        completion_font = pygame.font.Font("assets/fonts/Firlest-Regular.otf", 64)
-        time_font = pygame.font.Font("assets/fonts/JetBrainsMono-SemiBold.ttf", 72)
-        
-        completion_text = completion_font.render("Final Time", True, (255, 255, 255))
-        time_text = time_font.render(time_str, True, (0, 255, 0))
+        # Render completion text (the final time never changes, so both come from the cache)
+        completion_text = self.text_cache.render(self.completion_font, "Final Time", (255, 255, 255))
+        time_text = self.text_cache.render(self.final_time_font, time_str, (0, 255, 0))
         
         completion_rect = completion_text.get_rect()
         time_rect = time_text.get_rect()
@@ -159,41 +372,167 @@ class Game:
         # Draw text
         self.screen.blit(completion_text, completion_rect)
         self.screen.blit(time_text, time_rect)
+        self.draw_standing(time_rect.bottom + 30)
+
+    def draw_standing(self, top):
+        """Rank and per-level splits of the finished run, compared with the previous personal best."""
+        if self.standing is None or not self.standing.done() or self.standing.exception() is not None:
+            return
+        standing = self.standing.result()
+        rank = f"Rank {standing['rank']} of {standing['runs']}"
+        if standing['personal_best']:
+            rank += " - personal best!"
+        rank_text = self.text_cache.render(self.split_font, rank, (255, 215, 0))
+        self.screen.blit(rank_text, rank_text.get_rect(midtop=(self.screen_width // 2, top)))
+
+        best = standing['previous_best']
+        best_splits = best['splits'] if best else []
+        line_height = self.split_font.get_linesize()
+        y = top + line_height * 2
+        for level, (frames, deaths) in enumerate(self.run['splits']):
+            if y + line_height > self.screen_height:
+                break
+            name = self.levels[level]['name']
+            line = f"{name:<28.28} {self.format_time(frames * DT):>9}"
+            delta_text = None
+            if level < len(best_splits):
+                delta = (frames - best_splits[level][0]) * DT
+                delta_text = self.text_cache.render(self.split_font, f"{delta:+.3f}",
+                                                    (0, 255, 0) if delta <= 0 else (255, 80, 80))
+            text = self.text_cache.render(self.split_font, line, (255, 255, 255))
+            rect = text.get_rect(topright=(self.screen_width // 2 + 180, y))
+            self.screen.blit(text, rect)
+            if delta_text is not None:
+                self.screen.blit(delta_text, (rect.right + 20, y))
+            y += line_height
 
     def start_game(self):
         """Start the game from the first level."""
         self.menu_active = False
         self.active = True
-        self.level_num = 0
-        self.start_time = time.time()
+        self.accumulator = 0.0
+        self.alpha = 1.0
         self.elapsed_time = 0.0
         self.final_time = 0.0
-        self.level = Level(self.screen_width // 2 - self.bounds // 2, 
-                          self.screen_height // 2 - self.bounds // 2, 
-                          self.bounds, self.bounds, self.levels[self.level_num])
+        x, y = self.board_origin()
+        # Every run is recorded so it can be replayed and its time validated
+        self.recorder = Recorder(self.levels, x, y, self.bounds)
+        if self.simulation is not None and (self.simulation.x, self.simulation.y) != (x, y):
+            # The screen was resized after the first level was prepared for the old placement
+            self.simulation.close()
+            self.simulation = None
+        if self.simulation is None:
+            self.simulation = Simulation(self.levels, x, y, self.bounds, preload=True)
+        self.simulation.observers = [self.audio, self.recorder]
+        self.simulation.start()
+
+    def start_arena(self, count):
+        """Fill the screen with count boards played by bots, sharing level data, images and sound effects."""
+        self.menu_active = False
+        self.active = True
+        self.accumulator = 0.0
+        self.alpha = 1.0
+        self.dirty_rects = []
+        # A smaller title font so level names fit above the boards
+        font = pygame.font.Font("assets/fonts/Firlest-Regular.otf", 24)
+        self.arena = Arena(self.levels, count, self.screen.get_rect(), font,
+                           observers=[EffectsOnly(self.audio)])
+
+    @property
+    def level(self):
+        return self.simulation.level if self.simulation else None
 
     def tick(self):
+        """Run as many fixed DT simulation steps as the real time since the last frame covers."""
+        now = time.perf_counter()
+        frame_time = min(now - self.last_time, MAX_FRAME_TIME)
+        self.last_time = now
+        self.check_loader()
         if self.menu_active or not self.active:
             return
-        if (self.level.tick()):
-            self.level_num += 1
-            if self.level_num < len(self.levels):
-                self.level = Level(self.screen_width // 2 - self.bounds // 2, self.screen_height // 2 - self.bounds // 2, self.bounds, self.bounds, self.levels[self.level_num])
-            else:
-                # Stop timer immediately when game is completed
-                # Set active to False FIRST to prevent any further timer updates
-                self.active = False
-                self.final_time = time.time() - self.start_time
-                self.elapsed_time = self.final_time
+        self.accumulator += frame_time
+        if self.arena is not None:
+            self.tick_arena()
+            return
+        # The mouse position is the only input the simulation needs
+        x, y = pygame.mouse.get_pos()
+        steps = 0
+        with profiler.section("level.tick"):
+            while self.accumulator >= DT and steps < MAX_STEPS_PER_FRAME:
+                self.recorder.record_frame(x, y)
+                finished = self.simulation.step(x, y)
+                self.accumulator -= DT
+                steps += 1
+                if finished:
+                    # Stop the timer at the simulated time of the final step
+                    self.active = False
+                    self.final_time = self.simulation.time
+                    self.elapsed_time = self.final_time
+                    self.save_replay()
+                    self.save_run()
+                    return
+        profiler.count("sim_steps", steps)
+        if steps == MAX_STEPS_PER_FRAME:
+            # Too far behind to catch up: skip the backlog instead of slowing every later frame
+            self.accumulator = min(self.accumulator, DT)
+        self.alpha = self.accumulator / DT
 
+    def tick_arena(self):
+        """Fixed-step loop for arena mode: each step advances every board in one pass."""
+        steps = 0
+        with profiler.section("level.tick"):
+            while self.accumulator >= DT and steps < MAX_STEPS_PER_FRAME:
+                self.arena.step()
+                self.accumulator -= DT
+                steps += 1
+        profiler.count("sim_steps", steps)
+        if steps == MAX_STEPS_PER_FRAME:
+            self.accumulator = min(self.accumulator, DT)
+        self.alpha = self.accumulator / DT
+
+    def save_replay(self):
+        """Write the finished run's input log to the replays directory."""
+        self.recorder.finish(self.final_time)
+        self.replay_path = os.path.join("replays", time.strftime("run-%Y%m%d-%H%M%S.kqr"))
+        try:
+            self.recorder.save(self.replay_path)
+        except OSError as e:
+            print(f"Error saving replay {self.replay_path}: {e}")
+            self.replay_path = None
+
+
+    def save_run(self):
+        """Queue the finished run for the run store; its rank shows up once the writer thread has it."""
+        self.run = make_run(self.simulation, self.levels, self.replay_path)
+        self.standing = self.runs.submit(self.run) if self.runs is not None else None
+
+    def close(self):
+        """Stop background work before pygame shuts down."""
+        self.loader.wait(timeout=5)
+        if self.runs is not None:
+            self.runs.close()
+        if self.simulation is not None:
+            self.simulation.close()
+        if self.arena is not None:
+            self.arena.close()
 
     def wait(self):
-        self.clock.tick(60)
+        """Cap the render rate at fps; 0 renders as fast as possible (or at the refresh rate with vsync)."""
+        self.clock.tick(self.fps)
 
     def events(self):
+        with profiler.section("events"):
+            self.handle_events()
+
+    def handle_events(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 self.running = False
+            elif event.type == pygame.VIDEORESIZE:
+                self.resize(event.w, event.h)
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                # Toggle the frame-time overlay
+                profiler.toggle_overlay()
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1:  # Left mouse button
                     if self.menu_active and self.play_button_rect:
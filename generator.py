@@ -0,0 +1,261 @@
+import argparse
+import json
+import random
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool
+
+# Cell neighbours as (column, row) offsets
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+# Attempts at placing keys and doors before giving up on a seed
+MAX_ATTEMPTS = 20
+
+def carve_maze(cells, rng, braid=0.0):
+    """
+    Carve a perfect maze on a cells x cells grid with a randomized depth-first
+    search, then knock a wall out of each dead end with probability braid to
+    add loops. Returns the adjacency list of open passages (cell = row * cells + col).
+    """
+    adjacency = [[] for _ in range(cells * cells)]
+    visited = [False] * (cells * cells)
+    visited[0] = True
+    stack = [0]
+    while stack:
+        cell = stack[-1]
+        col, row = cell % cells, cell // cells
+        options = [(col + dc) + (row + dr) * cells for dc, dr in DIRECTIONS
+                   if 0 <= col + dc < cells and 0 <= row + dr < cells
+                   and not visited[(col + dc) + (row + dr) * cells]]
+        if not options:
+            stack.pop()
+            continue
+        neighbour = rng.choice(options)
+        visited[neighbour] = True
+        adjacency[cell].append(neighbour)
+        adjacency[neighbour].append(cell)
+        stack.append(neighbour)
+
+    if braid > 0:
+        for cell in range(cells * cells):
+            if len(adjacency[cell]) != 1 or rng.random() >= braid:
+                continue
+            col, row = cell % cells, cell // cells
+            closed = [(col + dc) + (row + dr) * cells for dc, dr in DIRECTIONS
+                      if 0 <= col + dc < cells and 0 <= row + dr < cells
+                      and (col + dc) + (row + dr) * cells not in adjacency[cell]]
+            if closed:
+                neighbour = rng.choice(closed)
+                adjacency[cell].append(neighbour)
+                adjacency[neighbour].append(cell)
+    return adjacency
+
+def bfs(adjacency, start, blocked=frozenset()):
+    """Distances and parents from start, never crossing a passage in blocked ((a, b) with a < b)."""
+    distance = {start: 0}
+    parent = {start: None}
+    queue = deque([start])
+    while queue:
+        cell = queue.popleft()
+        for neighbour in adjacency[cell]:
+            if neighbour in distance or (min(cell, neighbour), max(cell, neighbour)) in blocked:
+                continue
+            distance[neighbour] = distance[cell] + 1
+            parent[neighbour] = cell
+            queue.append(neighbour)
+    return distance, parent
+
+def solve(adjacency, spawn, exit_, doors, keys):
+    """
+    Search over (cell, keys held) states for a way from spawn to exit_.
+    doors[i] is the passage door i + 1 blocks and keys[i] the cell holding its key.
+    Returns the order the keys are picked up on the shortest solution, or None.
+    """
+    door_bits = {passage: 1 << i for i, passage in enumerate(doors)}
+    key_bits = {}
+    for i, cell in enumerate(keys):
+        key_bits[cell] = key_bits.get(cell, 0) | 1 << i
+    start = (spawn, key_bits.get(spawn, 0))
+    parent = {start: None}
+    queue = deque([start])
+    while queue:
+        state = queue.popleft()
+        cell, held = state
+        if cell == exit_:
+            order = []
+            while state is not None:
+                previous = parent[state]
+                gained = state[1] & ~(previous[1] if previous else 0)
+                order.extend(i for i in range(len(keys)) if gained & 1 << i)
+                state = previous
+            return order[::-1]
+        for neighbour in adjacency[cell]:
+            bit = door_bits.get((min(cell, neighbour), max(cell, neighbour)))
+            if bit is not None and not held & bit:
+                continue
+            next_state = (neighbour, held | key_bits.get(neighbour, 0))
+            if next_state not in parent:
+                parent[next_state] = state
+                queue.append(next_state)
+    return None
+
+def wall_segments(cells, adjacency):
+    """
+    Turn the closed cell edges into wall segments, merging runs along the same
+    grid line so a maze needs far fewer walls. Doors sit in open passages.
+    """
+    def open_between(a, b):
+        return b in adjacency[a]
+
+    segments = []
+    for line in range(cells + 1):
+        # Vertical line x = line, then horizontal line y = line
+        for vertical in (True, False):
+            start = None
+            for i in range(cells + 1):
+                closed = False
+                if i < cells:
+                    if line in (0, cells):
+                        closed = True
+                    elif vertical:
+                        closed = not open_between(i * cells + line - 1, i * cells + line)
+                    else:
+                        closed = not open_between((line - 1) * cells + i, line * cells + i)
+                if closed and start is None:
+                    start = i
+                elif not closed and start is not None:
+                    segments.append((line, start, line, i) if vertical else (start, line, i, line))
+                    start = None
+    return segments
+
+def passage_segment(cells, passage):
+    """The grid edge between two neighbouring cells, as (x1, y1, x2, y2) in cell units."""
+    a, b = passage
+    col, row = b % cells, b // cells
+    if b - a == 1:
+        return (col, row, col, row + 1)
+    return (col, row, col + 1, row)
+
+def generate_level(seed, cells=8, doors=1, dragons=0, braid=0.0, size=None, name=None):
+    """
+    Generate one solvable level in the levels.json schema. The spawn is the
+    top-left cell and the exit the cell farthest from it; doors sit on the
+    route between them and every key is reachable before its door.
+    """
+    if cells < 2:
+        raise ValueError("a maze needs at least 2 cells per side")
+    if doors > 2 * (cells - 1):
+        raise ValueError(f"at most {2 * (cells - 1)} doors fit on a {cells}x{cells} maze")
+    rng = random.Random(seed)
+    adjacency = carve_maze(cells, rng, braid)
+    spawn = 0
+    distance, parent = bfs(adjacency, spawn)
+    exit_ = max(distance, key=lambda cell: (distance[cell], cell))
+    route = [exit_]
+    while parent[route[-1]] is not None:
+        route.append(parent[route[-1]])
+    route.reverse()
+    if doors > len(route) - 1:
+        raise ValueError(f"seed {seed}: the route is too short for {doors} doors")
+
+    for _ in range(MAX_ATTEMPTS):
+        # One door in each equal stretch of the route, in order from spawn to exit
+        edges = len(route) - 1
+        positions = [rng.randrange(i * edges // doors, (i + 1) * edges // doors) for i in range(doors)]
+        door_passages = [(min(route[p], route[p + 1]), max(route[p], route[p + 1])) for p in positions]
+        # Key k lies in the area opened by door k - 1 (or around the spawn for the first)
+        key_cells = []
+        reached = {spawn}
+        for k in range(doors):
+            area = bfs(adjacency, spawn, frozenset(door_passages[k:]))[0]
+            fresh = [cell for cell in area if cell not in reached and cell not in key_cells and cell != exit_]
+            candidates = fresh or [cell for cell in area if cell not in (spawn, exit_) and cell not in key_cells] or [spawn]
+            key_cells.append(rng.choice(sorted(candidates)))
+            reached = set(area)
+        if solve(adjacency, spawn, exit_, door_passages, key_cells) is not None:
+            break
+    else:
+        raise RuntimeError(f"seed {seed}: could not place {doors} solvable doors")
+
+    # Dragons start in the far half of the maze so they don't camp the spawn
+    taken = {spawn, exit_, *key_cells}
+    far = [cell for cell in distance if distance[cell] * 2 >= distance[exit_] and cell not in taken]
+    near = [cell for cell in distance if cell not in taken and cell not in far]
+    if dragons > len(far) + len(near):
+        raise ValueError(f"not enough free cells for {dragons} dragons")
+    dragon_cells = rng.sample(sorted(far), min(dragons, len(far)))
+    dragon_cells += rng.sample(sorted(near), dragons - len(dragon_cells))
+
+    scale = 1 / cells
+    def point(x, y):
+        return [round(x * scale, 6), round(y * scale, 6)]
+    def center(cell):
+        return point(cell % cells + 0.5, cell // cells + 0.5)
+    def segment(x1, y1, x2, y2):
+        return point(x1, y1) + point(x2, y2)
+
+    return {
+        "name": name or f"Generated {seed}",
+        # Original 8x8 mazes use a size of 40, so keep sprites at 40% of a cell on an 800px board
+        "size": size or max(6, round(320 / cells)),
+        "spawn": center(spawn),
+        "exit": center(exit_),
+        "walls": [segment(*wall) for wall in wall_segments(cells, adjacency)],
+        "doors": [segment(*passage_segment(cells, passage)) for passage in door_passages],
+        "keys": [center(cell) for cell in key_cells],
+        "dragons": [center(cell) for cell in dragon_cells],
+    }
+
+def _generate_job(job):
+    seed, options = job
+    return generate_level(seed, **options)
+
+def generate_many(count, seed=0, processes=1, **options):
+    """
+    Yield count levels for seeds seed, seed + 1, ... in order. With more than
+    one process they are generated on a pool and streamed back as they finish.
+    """
+    jobs = ((seed + i, options) for i in range(count))
+    if processes == 1:
+        yield from map(_generate_job, jobs)
+        return
+    with Pool(processes) as pool:
+        yield from pool.imap(_generate_job, jobs, chunksize=32)
+
+def write_levels(levels, f):
+    """Stream levels to f as a levels.json array without holding them all in memory."""
+    count = 0
+    f.write("[")
+    for config in levels:
+        f.write(",\n" if count else "\n")
+        f.write(json.dumps(config, separators=(",", ":")))
+        count += 1
+    f.write("\n]\n")
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate solvable Knight's Quest mazes in the levels.json format.")
+    parser.add_argument("-n", "--count", type=int, default=1, help="number of levels")
+    parser.add_argument("-o", "--output", default="-", help="output file ('-' for stdout)")
+    parser.add_argument("--cells", type=int, default=8, help="maze cells per side")
+    parser.add_argument("--doors", type=int, default=1, help="doors (each with a key) per level")
+    parser.add_argument("--dragons", type=int, default=0, help="dragons per level")
+    parser.add_argument("--braid", type=float, default=0.0, help="chance of opening a loop at each dead end")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first level")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes (0 = one per CPU)")
+    args = parser.parse_args()
+
+    levels = generate_many(args.count, args.seed, args.processes or None, cells=args.cells,
+                           doors=args.doors, dragons=args.dragons, braid=args.braid)
+    start = time.perf_counter()
+    if args.output == "-":
+        count = write_levels(levels, sys.stdout)
+    else:
+        with open(args.output, "w") as f:
+            count = write_levels(levels, f)
+    elapsed = time.perf_counter() - start
+    print(f"Generated {count} levels in {elapsed:.2f}s", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
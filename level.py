@@ -1,100 +1,80 @@
 import pygame
-import re
-import os
-from entity import Player, Exit, Wall, Key, Door, Dragon
+from entity import Player, Exit, Wall, Key, Door, DragonSwarm
+from spatial import SpatialGrid
+from nav import NavGrid, FlowField
+from profiler import profiler
+from levelpack import LevelTemplate
+from assets import assets
+
+# Dragons only follow the flow field within this many nav cells (path length)
+# of the player. Farther away they head straight at the player and can get
+# stuck behind walls, which is what the shipped levels are balanced around.
+DRAGON_PURSUIT_CELLS = 12
+
+# Translucent board backgrounds by (width, height), shared by every Level of that size
+_board_surfaces = {}
+
+def board_surface(width, height):
+    """The translucent white board drawn under a level, rendered once per size."""
+    surface = _board_surfaces.get((width, height))
+    if surface is None:
+        surface = assets.convert(pygame.Surface((width, height), pygame.SRCALPHA))
+        surface.fill((255, 255, 255, 200))
+        _board_surfaces[(width, height)] = surface
+    return surface
 
 class Level:
 
-    def __init__(self, x, y, width, height, config):
+    def __init__(self, x, y, width, height, config, observers=None, index=None):
         self.x = x
         self.y = y
         self.width = width
         self.height = height
         self.size = config['size']
         self.name = config['name']
-        self.config = config  # Store config for reset
-        
-        # Load unlock sound effect
-        self.unlock_sound = None
-        unlock_sound_path = "assets/sounds/unlock.mp3"
-        if os.path.exists(unlock_sound_path):
-            try:
-                self.unlock_sound = pygame.mixer.Sound(unlock_sound_path)
-            except pygame.error as e:
-                print(f"Error loading unlock sound: {e}")
-        else:
-            print(f"Unlock sound file not found: {unlock_sound_path}")
-        
-        # Load death sound effect
-        self.death_sound = None
-        death_sound_path = "assets/sounds/death.mp3"
-        if os.path.exists(death_sound_path):
-            try:
-                self.death_sound = pygame.mixer.Sound(death_sound_path)
-            except pygame.error as e:
-                print(f"Error loading death sound: {e}")
-        else:
-            print(f"Death sound file not found: {death_sound_path}")
+        self.config = config
+        # Position in the level list, if known (used e.g. to prefetch the next level's music)
+        self.index = index
         
-        # Play level sound
-        self.play_level_sound()
-        self.player = Player(x + width * config['spawn'][0], y + height * config['spawn'][1], self.size, self.size / 15)
-        self.exit = Exit(x + width * config['exit'][0], y + height * config['exit'][1], self.size)
+        # Cached render state; static_version changes whenever the static layer must be redrawn
+        self.board_surface = None
+        self.title_surface = None
+        self.static_version = 0
         
-        # Create walls from config
-        self.walls = []
-        if 'walls' in config:
-            for wall_data in config['walls']:
-                # Walls are defined as [x1, y1, x2, y2] in relative coordinates (0-1)
-                x1 = x + width * wall_data[0]
-                y1 = y + height * wall_data[1]
-                x2 = x + width * wall_data[2]
-                y2 = y + height * wall_data[3]
-                self.walls.append(Wall(x1, y1, x2, y2))
+        # Observers (audio, recorders, ...) are notified of level events via on_level_event
+        self.observers = list(observers) if observers else []
+        self.deaths = 0
         
-        # Create keys from config
-        self.keys = []
-        if 'keys' in config:
-            for i, key_data in enumerate(config['keys']):
-                # Keys are defined as [x, y] in relative coordinates (0-1)
-                key_x = x + width * key_data[0]
-                key_y = y + height * key_data[1]
-                # Key IDs start at 1 (key #1, key #2, etc.)
-                self.keys.append(Key(key_x, key_y, self.size * 1.5, key_id=i+1))
+        # Absolute geometry is computed once per config and placement and shared
+        self.template = LevelTemplate.get(config, x, y, width, height)
+        self.create_entities()
         
-        # Create doors from config
-        self.doors = []
-        if 'doors' in config:
-            for i, door_data in enumerate(config['doors']):
-                # Doors are defined as [x1, y1, x2, y2] in relative coordinates (0-1)
-                x1 = x + width * door_data[0]
-                y1 = y + height * door_data[1]
-                x2 = x + width * door_data[2]
-                y2 = y + height * door_data[3]
-                # Door IDs start at 1 (door #1, door #2, etc.)
-                self.doors.append(Door(x1, y1, x2, y2, door_id=i+1))
-        
-        # Create dragons from config
-        self.dragons = []
-        if 'dragons' in config:
-            for dragon_data in config['dragons']:
-                # Dragons are defined as [x, y] in relative coordinates (0-1)
-                dragon_x = x + width * dragon_data[0]
-                dragon_y = y + height * dragon_data[1]
-                # Dragon speed - faster than player
-                dragon_speed = self.size / 12  # Faster than player (player is size/15)
-                self.dragons.append(Dragon(dragon_x, dragon_y, self.size, dragon_speed))
-
-    def draw(self, screen, font):
-        temp_surface = pygame.Surface(
-            (self.width, self.height), pygame.SRCALPHA
-        )
-        pygame.draw.rect(
-            temp_surface,
-            (255, 255, 255, 200),
-            (0, 0, self.width, self.height)
-        )
-        screen.blit(temp_surface, (self.x, self.y))
+        self.build_collision_grid()
+        self.initial_state = self.snapshot()
+
+    def build_collision_grid(self):
+        """Index walls and locked doors so movement only tests nearby segments, and derive the dragons' navigation grid."""
+        # Cells about two entity widths across keep buckets small on dense mazes
+        self.collision_grid = SpatialGrid(self.x, self.y, self.width, self.height, self.size * 2)
+        for wall in self.walls:
+            self.collision_grid.insert(wall)
+        for door in self.doors:
+            if not door.unlocked:
+                self.collision_grid.insert(door)
+        # Dragons share one navigation grid and flow field towards the player
+        self.nav = NavGrid(self) if self.dragons else None
+        self.flow = FlowField(self.nav, DRAGON_PURSUIT_CELLS) if self.dragons else None
+
+    def invalidate(self):
+        """Mark the cached static layer (walls, doors, keys, title) as out of date."""
+        self.static_version += 1
+
+    def draw_static(self, screen, font):
+        """Draw everything that only changes when a key is collected or a door opens."""
+        if self.board_surface is None:
+            # The translucent board never changes, so every level of this size shares one
+            self.board_surface = board_surface(self.width, self.height)
+        screen.blit(self.board_surface, (self.x, self.y))
         # Draw walls
         for wall in self.walls:
             wall.draw(screen)
@@ -105,135 +85,154 @@ class Level:
         # Draw keys
         for key in self.keys:
             key.draw(screen)
-        # Draw dragons
-        for dragon in self.dragons:
-            dragon.draw(screen)
         self.exit.draw(screen)
-        self.player.draw(screen)
-        text_surface = font.render(self.name, True, (255, 255, 255))
-        screen.blit(text_surface, (10, 10))
-
-    def play_level_sound(self):
-        """Play the sound for the current level."""
-        # Extract level number from name (e.g., "Level 1 - The Beginning" -> 1)
-        level_match = re.search(r'Level\s+(\d+)', self.name)
-        if level_match:
-            level_num = level_match.group(1)
-            sound_path = f"assets/sounds/Level {level_num}.wav"
-            
-            # Check if file exists
-            if not os.path.exists(sound_path):
-                print(f"Sound file not found: {sound_path}")
+        if self.title_surface is None:
+            self.title_surface = assets.convert(font.render(self.name, True, (255, 255, 255)))
+        screen.blit(self.title_surface, (10, 10))
+
+    def draw_dynamic(self, screen, alpha=1.0):
+        """
+        Draw the moving sprites and return the screen rects they cover.
+        alpha blends between the last two simulation steps (1 draws the latest).
+        """
+        # Draw dragons
+        rects = self.dragons.draw(screen, alpha)
+        self.player.draw(screen, alpha)
+        rects.append(self.player.rect.copy())
+        return rects
+
+    def draw(self, screen, font, alpha=1.0):
+        self.draw_static(screen, font)
+        self.draw_dynamic(screen, alpha)
+
+    def notify(self, event):
+        """Tell every observer that something happened ('start', 'reset', 'unlock', 'death')."""
+        for observer in self.observers:
+            observer.on_level_event(self, event)
+
+    def start(self):
+        """Called once when the level becomes the active one."""
+        self.notify("start")
+
+    def create_entities(self):
+        """Build every entity from the precomputed template."""
+        template = self.template
+        self.player = Player(template.spawn[0], template.spawn[1], self.size, self.size / 15)
+        self.exit = Exit(template.exit[0], template.exit[1], self.size)
+        self.walls = [Wall(*wall) for wall in template.walls]
+        # Key and door IDs start at 1 (key #1 unlocks door #1, etc.)
+        self.keys = [Key(key_x, key_y, self.size * 1.5, key_id=i+1)
+                     for i, (key_x, key_y) in enumerate(template.keys)]
+        self.doors = [Door(*door, door_id=i+1) for i, door in enumerate(template.doors)]
+        # Dragon speed - faster than player (player is size/15); stored as arrays for crowd-sized levels
+        self.dragons = DragonSwarm(template.dragons, self.size, self.size / 12)
+
+    def snapshot(self):
+        """Capture the mutable state (positions, facings and key/door flags) as an immutable tuple."""
+        return (
+            (self.player.x, self.player.y, self.player.facing),
+            self.dragons.snapshot(),
+            tuple(key.collected for key in self.keys),
+            tuple(door.unlocked for door in self.doors),
+        )
+
+    def restore(self):
+        """
+        Put the level back in its initial state by restoring the snapshot taken
+        at construction in place. Walls, images and the collision grid are kept;
+        only doors whose state changed are touched.
+        """
+        player_position, dragon_state, keys_collected, doors_unlocked = self.initial_state
+        self.player.x, self.player.y, self.player.facing = player_position
+        self.dragons.restore(dragon_state)
+        for key, collected in zip(self.keys, keys_collected):
+            key.collected = collected
+        for door, unlocked in zip(self.doors, doors_unlocked):
+            if door.unlocked == unlocked:
+                continue
+            door.unlocked = unlocked
+            if unlocked:
+                self.collision_grid.remove(door)
             else:
-                try:
-                    # Stop any currently playing music
-                    pygame.mixer.music.stop()
-                    # Load and play the WAV file
-                    pygame.mixer.music.load(sound_path)
-                    pygame.mixer.music.set_volume(0.7)  # Set volume (0.0 to 1.0)
-                    pygame.mixer.music.play(0)  # 0 means play once
-                except pygame.error as e:
-                    print(f"Error loading sound file {sound_path}: {e}")
-                except Exception as e:
-                    print(f"Unexpected error loading sound file {sound_path}: {e}")
-                    import traceback
-                    traceback.print_exc()
+                self.collision_grid.insert(door)
+            if self.nav:
+                self.nav.update_door(door)
+        # Don't interpolate across the jump back to the start
+        self.settle()
+        self.invalidate()
 
     def reset(self):
-        """Reset the level to its initial state."""
-        # Replay the level sound
-        self.play_level_sound()
-        
-        # Recreate all entities from config
-        self.player = Player(self.x + self.width * self.config['spawn'][0], 
-                            self.y + self.height * self.config['spawn'][1], 
-                            self.size, self.size / 15)
-        self.exit = Exit(self.x + self.width * self.config['exit'][0], 
-                        self.y + self.height * self.config['exit'][1], 
-                        self.size)
-        
-        # Recreate walls
-        self.walls = []
-        if 'walls' in self.config:
-            for wall_data in self.config['walls']:
-                x1 = self.x + self.width * wall_data[0]
-                y1 = self.y + self.height * wall_data[1]
-                x2 = self.x + self.width * wall_data[2]
-                y2 = self.y + self.height * wall_data[3]
-                self.walls.append(Wall(x1, y1, x2, y2))
-        
-        # Recreate keys
-        self.keys = []
-        if 'keys' in self.config:
-            for i, key_data in enumerate(self.config['keys']):
-                key_x = self.x + self.width * key_data[0]
-                key_y = self.y + self.height * key_data[1]
-                # Key IDs start at 1 (key #1, key #2, etc.)
-                self.keys.append(Key(key_x, key_y, self.size * 1.5, key_id=i+1))
-        
-        # Recreate doors
-        self.doors = []
-        if 'doors' in self.config:
-            for i, door_data in enumerate(self.config['doors']):
-                x1 = self.x + self.width * door_data[0]
-                y1 = self.y + self.height * door_data[1]
-                x2 = self.x + self.width * door_data[2]
-                y2 = self.y + self.height * door_data[3]
-                # Door IDs start at 1 (door #1, door #2, etc.)
-                self.doors.append(Door(x1, y1, x2, y2, door_id=i+1))
-        
-        # Recreate dragons
-        self.dragons = []
-        if 'dragons' in self.config:
-            for dragon_data in self.config['dragons']:
-                dragon_x = self.x + self.width * dragon_data[0]
-                dragon_y = self.y + self.height * dragon_data[1]
-                dragon_speed = self.size / 12  # Faster than player
-                self.dragons.append(Dragon(dragon_x, dragon_y, self.size, dragon_speed))
+        """Restart the level after a death."""
+        self.restore()
+        self.notify("reset")
+
+    def recycle(self, observers=None):
+        """Prepare a previously played level for a new run, with fresh observers and no deaths."""
+        self.observers = list(observers) if observers else []
+        self.deaths = 0
+        self.restore()
+
+    def warm(self):
+        """Decode and scale every sprite image (and rotation frames) now, so the first draw doesn't."""
+        for sprite in [self.player, self.exit, *self.keys]:
+            sprite.frame()
+        self.dragons.frames()
+
+    def settle(self):
+        """Record the current positions of the moving sprites as the previous step's."""
+        self.player.settle()
+        self.dragons.settle()
 
     def tick(self):
+        """Advance one frame steering the player towards the mouse."""
         x, y = pygame.mouse.get_pos()
+        return self.step(x, y)
+
+    def step(self, x, y):
+        """
+        Advance the simulation by one fixed step with the player steering towards (x, y).
+        Touches no display, mouse or mixer state, so it runs headless.
+        Returns True once the player reaches the exit.
+        """
         player_radius = self.size / 2
+        self.settle()
         
         # Check for key collisions and collect keys
-        for key in self.keys:
-            if not key.collected and key.check_collision(self.player.x, self.player.y, self.player.size):
-                key.collected = True
-                # Play unlock sound
-                if self.unlock_sound:
-                    try:
-                        self.unlock_sound.play()
-                    except pygame.error as e:
-                        print(f"Error playing unlock sound: {e}")
-                # Unlock the door with matching ID (key #1 unlocks door #1, etc.)
-                for door in self.doors:
-                    if door.door_id == key.key_id:
-                        door.unlocked = True
-                        break
-        
-        # Combine walls and unlocked doors for collision detection (only locked doors block movement)
-        all_walls = self.walls + [door for door in self.doors if not door.unlocked]
-        
-        self.player.moveTowards(x, y, self.x + player_radius, self.y + player_radius, 
-                                self.x + self.width - player_radius, self.y + self.height - player_radius, all_walls)
-        
-        # Move dragons towards player
-        for dragon in self.dragons:
-            dragon.moveTowards(self.player.x, self.player.y, 
-                              self.x + player_radius, self.y + player_radius,
-                              self.x + self.width - player_radius, self.y + self.height - player_radius, 
-                              all_walls)
-            
-            # Check if dragon touches player
-            if dragon.check_collision(self.player.x, self.player.y, self.player.size):
-                # Play death sound
-                if self.death_sound:
-                    try:
-                        self.death_sound.play()
-                    except pygame.error as e:
-                        print(f"Error playing death sound: {e}")
+        with profiler.section("tick.keys"):
+            for key in self.keys:
+                if not key.collected and key.check_collision(self.player.x, self.player.y, self.player.size):
+                    key.collected = True
+                    self.notify("unlock")
+                    # Unlock the door with matching ID (key #1 unlocks door #1, etc.)
+                    for door in self.doors:
+                        if door.door_id == key.key_id:
+                            door.unlocked = True
+                            # Unlocked doors no longer block movement
+                            self.collision_grid.remove(door)
+                            if self.nav:
+                                self.nav.update_door(door)
+                            break
+                    # The key and door disappear from the static layer
+                    self.invalidate()
+        
+        with profiler.section("tick.player"):
+            self.player.moveTowards(x, y, self.x + player_radius, self.y + player_radius, 
+                                    self.x + self.width - player_radius, self.y + self.height - player_radius, self.collision_grid)
+        
+        # Move dragons towards player along the shared flow field
+        with profiler.section("tick.dragons"):
+            if self.flow:
+                self.flow.update(self.player.x, self.player.y)
+            caught = self.dragons.advance(self.flow, self.player.x, self.player.y, self.player.size,
+                                          self.x + player_radius, self.y + player_radius,
+                                          self.x + self.width - player_radius, self.y + self.height - player_radius,
+                                          self.collision_grid)
+            if caught >= 0:
+                # A dragon touched the player
+                self.deaths += 1
+                self.notify("death")
                 # Reset the level
                 self.reset()
                 return False  # Level not completed
         
-        return self.player.touchingExit(self.exit)
\ No newline at end of file
+        return self.player.touchingExit(self.exit)
@@ -0,0 +1,203 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import OrderedDict
+
+# Pack layout (little-endian):
+#   header:  magic, format version, level count
+#   index:   (offset, length) of every level record
+#   records: name, size, spawn, exit, entity counts, then one float64 array
+#            holding walls (4 per), keys (2 per), doors (4 per), dragons (2 per)
+MAGIC = b"KQLP"
+VERSION = 1
+HEADER = struct.Struct("<4sHI")
+INDEX_ENTRY = struct.Struct("<QI")
+RECORD_HEAD = struct.Struct("<d2d2d4I")
+
+def _point(value, field, name):
+    if not (isinstance(value, (list, tuple)) and len(value) == 2
+            and all(isinstance(v, (int, float)) for v in value)):
+        raise ValueError(f"{name}: '{field}' must be [x, y], got {value!r}")
+
+def validate_config(config):
+    """Check a level config against the levels.json schema, raising ValueError on problems."""
+    if not isinstance(config, dict):
+        raise ValueError(f"level must be an object, got {type(config).__name__}")
+    name = config.get('name')
+    if not isinstance(name, str):
+        raise ValueError(f"level name must be a string, got {name!r}")
+    size = config.get('size')
+    if not isinstance(size, (int, float)) or size <= 0:
+        raise ValueError(f"{name}: 'size' must be a positive number, got {size!r}")
+    for field in ('spawn', 'exit'):
+        _point(config.get(field), field, name)
+    for field, arity in (('walls', 4), ('doors', 4), ('keys', 2), ('dragons', 2)):
+        for item in config.get(field, []):
+            if not (isinstance(item, (list, tuple)) and len(item) == arity
+                    and all(isinstance(v, (int, float)) for v in item)):
+                raise ValueError(f"{name}: every entry of '{field}' must have {arity} numbers, got {item!r}")
+
+def encode_level(config):
+    """Serialize one validated level config to a pack record."""
+    name = config['name'].encode("utf-8")
+    walls = config.get('walls', [])
+    keys = config.get('keys', [])
+    doors = config.get('doors', [])
+    dragons = config.get('dragons', [])
+    values = array("d")
+    for group in (walls, keys, doors, dragons):
+        for item in group:
+            values.extend(item)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return (struct.pack("<H", len(name)) + name
+            + RECORD_HEAD.pack(config['size'], *config['spawn'], *config['exit'],
+                               len(walls), len(keys), len(doors), len(dragons))
+            + values.tobytes())
+
+def decode_level(data):
+    """Turn a pack record back into a levels.json-style config dict."""
+    name_length = struct.unpack_from("<H", data, 0)[0]
+    name = bytes(data[2:2 + name_length]).decode("utf-8")
+    offset = 2 + name_length
+    head = RECORD_HEAD.unpack_from(data, offset)
+    size, spawn, exit_ = head[0], list(head[1:3]), list(head[3:5])
+    counts = head[5:9]
+    values = array("d")
+    values.frombytes(bytes(data[offset + RECORD_HEAD.size:]))
+    if sys.byteorder != "little":
+        values.byteswap()
+    config = {"name": name, "size": int(size) if size == int(size) else size,
+              "spawn": spawn, "exit": exit_}
+    position = 0
+    for field, arity, count in zip(('walls', 'keys', 'doors', 'dragons'), (4, 2, 4, 2), counts):
+        items = []
+        for _ in range(count):
+            items.append(list(values[position:position + arity]))
+            position += arity
+        if items:
+            config[field] = items
+    return config
+
+def compile_pack(levels, path):
+    """Validate every level and write them to a binary pack at path."""
+    records = []
+    for config in levels:
+        validate_config(config)
+        records.append(encode_level(config))
+    offset = HEADER.size + INDEX_ENTRY.size * len(records)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(records)))
+        for record in records:
+            f.write(INDEX_ENTRY.pack(offset, len(record)))
+            offset += len(record)
+        for record in records:
+            f.write(record)
+
+class LevelPack:
+    """
+    Read-only, memory-mapped level pack. Behaves like a list of config dicts
+    but only decodes a level the first time it is indexed.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} level pack")
+        self.cache = {}
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        config = self.cache.get(i)
+        if config is None:
+            config = decode_level(self.record(i))
+            self.cache[i] = config
+        return config
+
+    def record(self, i):
+        """The raw, undecoded record of level i (the bytes encode_level() produced)."""
+        if not 0 <= i < self.count:
+            raise IndexError("level index out of range")
+        offset, length = INDEX_ENTRY.unpack_from(self.data, HEADER.size + INDEX_ENTRY.size * i)
+        if offset + length > len(self.data):
+            raise ValueError(f"{self.path}: level {i} runs past the end of the pack")
+        return memoryview(self.data)[offset:offset + length]
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+class LevelTemplate:
+    """
+    A level's geometry in absolute screen coordinates for one board placement,
+    computed once and shared by every Level built (or reset) from it.
+    """
+    # Recently used templates, keyed by config identity and placement
+    _cache = OrderedDict()
+    max_cached = 256
+
+    def __init__(self, config, x, y, width, height):
+        self.config = config
+        self.name = config['name']
+        self.size = config['size']
+        self.spawn = (x + width * config['spawn'][0], y + height * config['spawn'][1])
+        self.exit = (x + width * config['exit'][0], y + height * config['exit'][1])
+        # Walls and doors are [x1, y1, x2, y2], keys and dragons [x, y], all relative (0-1)
+        self.walls = [(x + width * w[0], y + height * w[1], x + width * w[2], y + height * w[3])
+                      for w in config.get('walls', [])]
+        self.doors = [(x + width * d[0], y + height * d[1], x + width * d[2], y + height * d[3])
+                      for d in config.get('doors', [])]
+        self.keys = [(x + width * k[0], y + height * k[1]) for k in config.get('keys', [])]
+        self.dragons = [(x + width * d[0], y + height * d[1]) for d in config.get('dragons', [])]
+
+    @classmethod
+    def get(cls, config, x, y, width, height):
+        """Return the shared template for a config placed at (x, y, width, height)."""
+        key = (id(config), x, y, width, height)
+        template = cls._cache.get(key)
+        # The config is kept on the template, so its id can't be reused while cached
+        if template is None or template.config is not config:
+            template = cls(config, x, y, width, height)
+            cls._cache[key] = template
+            if len(cls._cache) > cls.max_cached:
+                cls._cache.popitem(last=False)
+        else:
+            cls._cache.move_to_end(key)
+        return template
+
+def load_levels(path):
+    """Load a level pack (.kqp) lazily, or a levels.json file eagerly with validation."""
+    if path.endswith(".kqp"):
+        return LevelPack(path)
+    with open(path, "r") as f:
+        levels = json.load(f)
+    for config in levels:
+        validate_config(config)
+    return levels
+
+def default_levels_path():
+    """Prefer a compiled pack next to levels.json when one is present and up to date."""
+    if os.path.exists("levels.kqp") and (not os.path.exists("levels.json")
+                                         or os.path.getmtime("levels.kqp") >= os.path.getmtime("levels.json")):
+        return "levels.kqp"
+    return "levels.json"
+
+if __name__ == "__main__":
+    source = sys.argv[1] if len(sys.argv) > 1 else "levels.json"
+    target = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(source)[0] + ".kqp"
+    levels = load_levels(source)
+    compile_pack(levels, target)
+    print(f"Compiled {len(levels)} levels from {source} into {target}")
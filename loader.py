@@ -0,0 +1,47 @@
+import threading
+from profiler import profiler
+
+class Loader:
+    """
+    Runs named loading steps in order on a background thread so the menu can
+    be shown and redrawn meanwhile. progress goes from 0 to 1 as steps finish
+    and every step is timed as a startup phase.
+    """
+    def __init__(self, steps):
+        self.steps = list(steps)
+        self.done = 0
+        self.current = None
+        self.error = None
+        self.finished = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="loader", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        try:
+            for name, step in self.steps:
+                self.current = name
+                with profiler.phase(name):
+                    step()
+                self.done += 1
+        except Exception as e:
+            print(f"Error while loading {self.current}: {e}")
+            self.error = e
+        finally:
+            self.current = None
+            self.finished.set()
+
+    @property
+    def progress(self):
+        return self.done / len(self.steps) if self.steps else 1.0
+
+    @property
+    def ready(self):
+        """True once every step has finished without an error."""
+        return self.finished.is_set() and self.error is None
+
+    def wait(self, timeout=None):
+        """Block until loading has finished (or timeout seconds pass); returns whether it finished."""
+        return self.finished.wait(timeout)
@@ -1,21 +1,38 @@
+from profiler import profiler
 import pygame
+import os
 from game import Game
 
-pygame.init()
-# Initialize mixer with better settings for audio playback
-try:
-    pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=512)
-    print("Mixer initialized successfully")
-except pygame.error as e:
-    print(f"Mixer initialization error: {e}")
-    pygame.mixer.init()  # Fallback to default initialization
+profiler.mark("imports")
+# Only what the menu needs; the mixer is started by the game's background loader
+with profiler.phase("pygame init"):
+    pygame.display.init()
+    pygame.font.init()
 
-mygame = Game()
+# Render rate: KQ_FPS caps frames per second (0 = uncapped), KQ_VSYNC=1 syncs to the display.
+# The simulation always advances in fixed steps, so neither changes game speed.
+vsync = os.environ.get("KQ_VSYNC") == "1"
+# KQ_ARENA=N skips the menu and shows N bot-driven boards at once
+mygame = Game(fps=int(os.environ.get("KQ_FPS", "0" if vsync else "144")), vsync=vsync,
+              arena=int(os.environ.get("KQ_ARENA", "0")),
+              # KQ_QUALITY=fast scales images with nearest-neighbour instead of smoothscale
+              quality=os.environ.get("KQ_QUALITY", "smooth"))
 
+first_frame = True
 while mygame.running:
+    profiler.begin_frame()
     mygame.events()
     mygame.tick()
     mygame.draw()
+    if first_frame:
+        profiler.mark("first frame")
+        first_frame = False
     mygame.wait()
+    profiler.end_frame()
 
+# Dump frame timings when profiling was on (KQ_PROFILE=1 or the F3 overlay)
+if profiler.enabled and profiler.frames:
+    profiler.dump(os.environ.get("KQ_PROFILE_OUT", "profile.csv"))
+
+mygame.close()
 pygame.quit()
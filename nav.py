@@ -0,0 +1,203 @@
+from collections import deque
+
+# 8-connected neighbourhood (orthogonal moves first)
+NEIGHBOURS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+
+class NavGrid:
+    """
+    Walkable-cell grid derived from a level's walls and locked doors.
+    A cell is walkable when a circle of radius clearance at its center
+    touches no segment. Opening or closing a door only re-tests the cells around it.
+    """
+    def __init__(self, level, cell_size=None, clearance=None):
+        self.left = level.x
+        self.top = level.y
+        self.collision_grid = level.collision_grid
+        self.clearance = clearance if clearance is not None else level.size / 2 * 0.8
+        # Cells no wider than twice the clearance can never straddle a wall
+        self.cell_size = cell_size or min(level.size / 2, self.clearance * 2)
+        self.cols = max(1, int(level.width // self.cell_size))
+        self.rows = max(1, int(level.height // self.cell_size))
+        self.walkable = bytearray(self.cols * self.rows)
+        for row in range(self.rows):
+            for col in range(self.cols):
+                self.walkable[row * self.cols + col] = self._test((col, row))
+        # Bumped every time walkability changes so flow fields know to rebuild
+        self.version = 0
+        self._adjacency = None
+
+    def _test(self, cell):
+        x, y = self.center(cell)
+        return not self.collision_grid.collides(x, y, self.clearance)
+
+    def center(self, cell):
+        col, row = cell
+        return (self.left + (col + 0.5) * self.cell_size,
+                self.top + (row + 0.5) * self.cell_size)
+
+    def cell_at(self, x, y):
+        col = int((x - self.left) // self.cell_size)
+        row = int((y - self.top) // self.cell_size)
+        return (min(max(col, 0), self.cols - 1), min(max(row, 0), self.rows - 1))
+
+    def passable(self, cell):
+        col, row = cell
+        return 0 <= col < self.cols and 0 <= row < self.rows and self.walkable[row * self.cols + col] == 1
+
+    def neighbours(self, cell):
+        """Yield walkable 8-connected neighbours, without cutting corners diagonally."""
+        col, row = cell
+        for dc, dr in NEIGHBOURS:
+            neighbour = (col + dc, row + dr)
+            if not self.passable(neighbour):
+                continue
+            if dc and dr and not (self.passable((col + dc, row)) and self.passable((col, row + dr))):
+                continue
+            yield neighbour
+
+    def adjacency(self):
+        """
+        Walkable neighbours of every cell as flat indices (row * cols + col),
+        built once per walkability change so searches avoid per-step bounds checks.
+        """
+        if self._adjacency is None:
+            adjacency = []
+            for row in range(self.rows):
+                for col in range(self.cols):
+                    if self.walkable[row * self.cols + col]:
+                        adjacency.append(tuple(r * self.cols + c for c, r in self.neighbours((col, row))))
+                    else:
+                        adjacency.append(())
+            self._adjacency = adjacency
+        return self._adjacency
+
+    def update_door(self, door):
+        """Re-test only the cells near a door that was just removed from (or put back into) the collision grid."""
+        reach = self.clearance + self.cell_size
+        col0, row0 = self.cell_at(min(door.x1, door.x2) - reach, min(door.y1, door.y2) - reach)
+        col1, row1 = self.cell_at(max(door.x1, door.x2) + reach, max(door.y1, door.y2) + reach)
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                self.walkable[row * self.cols + col] = self._test((col, row))
+        self.version += 1
+        self._adjacency = None
+
+    def nearest_passable(self, cell):
+        """Return the closest walkable cell to cell (the cell itself if it is walkable)."""
+        if self.passable(cell):
+            return cell
+        seen = {cell}
+        queue = deque([cell])
+        while queue:
+            col, row = queue.popleft()
+            for dc, dr in NEIGHBOURS[:4]:
+                neighbour = (col + dc, row + dr)
+                if neighbour in seen or not (0 <= neighbour[0] < self.cols and 0 <= neighbour[1] < self.rows):
+                    continue
+                if self.passable(neighbour):
+                    return neighbour
+                seen.add(neighbour)
+                queue.append(neighbour)
+        return None
+
+    def path(self, start, goal):
+        """Return waypoints from start to goal (both (x, y)), or None if unreachable."""
+        start_cell = self.nearest_passable(self.cell_at(*start))
+        goal_cell = self.nearest_passable(self.cell_at(*goal))
+        if start_cell is None or goal_cell is None:
+            return None
+        came_from = {start_cell: None}
+        queue = deque([start_cell])
+        while queue:
+            cell = queue.popleft()
+            if cell == goal_cell:
+                break
+            for neighbour in self.neighbours(cell):
+                if neighbour not in came_from:
+                    came_from[neighbour] = cell
+                    queue.append(neighbour)
+        if goal_cell not in came_from:
+            return None
+        cells = []
+        cell = goal_cell
+        while cell is not None:
+            cells.append(cell)
+            cell = came_from[cell]
+        cells.reverse()
+        return [self.center(cell) for cell in cells] + [goal]
+
+class FlowField:
+    """
+    Breadth-first distance field towards one goal cell over a NavGrid.
+    Every cell points at its neighbour closest to the goal, so any number of
+    dragons can look up their next waypoint in O(1). The field is only rebuilt
+    when the goal changes cell or the grid's walkability changes. With
+    max_distance set, cells farther than that from the goal are left out and
+    get no waypoint.
+    """
+    def __init__(self, nav, max_distance=None):
+        self.nav = nav
+        self.max_distance = max_distance
+        self.goal = None
+        self.version = None
+        self.next_cell = []
+        self.distance = []
+
+    def update(self, x, y):
+        """Point the field at (x, y), rebuilding it only if something changed."""
+        goal = self.nav.nearest_passable(self.nav.cell_at(x, y))
+        if goal == self.goal and self.nav.version == self.version:
+            return
+        self.goal = goal
+        self.version = self.nav.version
+        cols = self.nav.cols
+        # Flat per-cell arrays: -1 marks cells that cannot reach the goal
+        self.distance = distance = [-1] * (cols * self.nav.rows)
+        self.next_cell = next_cell = [-1] * (cols * self.nav.rows)
+        if goal is None:
+            return
+        adjacency = self.nav.adjacency()
+        start = goal[1] * cols + goal[0]
+        distance[start] = 0
+        queue = deque([start])
+        limit = self.max_distance
+        while queue:
+            cell = queue.popleft()
+            step = distance[cell] + 1
+            if limit is not None and step > limit:
+                break
+            for neighbour in adjacency[cell]:
+                if distance[neighbour] < 0:
+                    distance[neighbour] = step
+                    next_cell[neighbour] = cell
+                    queue.append(neighbour)
+
+    def waypoint(self, x, y, lookahead=2):
+        """
+        Return the point to steer at from (x, y), a few cells down the field,
+        or None when (x, y) is within lookahead cells of the goal or cannot reach it.
+        """
+        if self.goal is None:
+            return None
+        nav = self.nav
+        col, row = nav.cell_at(x, y)
+        cell = row * nav.cols + col
+        distance = self.distance
+        if distance[cell] < 0:
+            # Hugging a wall can leave the center in a blocked cell; use the best neighbour
+            best = -1
+            for dc, dr in NEIGHBOURS:
+                c = col + dc
+                r = row + dr
+                if 0 <= c < nav.cols and 0 <= r < nav.rows:
+                    neighbour = r * nav.cols + c
+                    if distance[neighbour] >= 0 and (best < 0 or distance[neighbour] < distance[best]):
+                        best = neighbour
+            if best < 0:
+                return None
+            cell = best
+        if distance[cell] <= lookahead:
+            return None
+        for _ in range(lookahead):
+            cell = self.next_cell[cell]
+        return nav.center((cell % nav.cols, cell // nav.cols))
@@ -0,0 +1,173 @@
+import time
+
+# Taken before pygame is imported, so startup phases include the import itself
+STARTED = time.perf_counter()
+
+import pygame
+import csv
+import json
+import os
+import threading
+from collections import deque
+
+class _Section:
+    """Context manager that adds its wall time to the current frame's entry for name."""
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        current = self.profiler.current
+        current[self.name] = current.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+class _NullSection:
+    """Shared no-op section used while profiling is off."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SECTION = _NullSection()
+
+class _Phase:
+    """Context manager recording one startup phase: (name, seconds, seconds since start when it ended)."""
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.profiler.phases.append((self.name, end - self.start, end - STARTED,
+                                     threading.current_thread().name))
+        return False
+
+class Profiler:
+    """
+    Opt-in frame-time instrumentation. Records per-frame durations of named
+    sections plus counters, can draw an FPS / p50 / p99 overlay and dumps the
+    whole session to CSV or JSON. Costs almost nothing while disabled.
+    """
+    def __init__(self, enabled=False, window=300, max_frames=100000):
+        self.enabled = enabled
+        self.overlay_visible = False
+        # Recent frame durations for the overlay, and every recorded frame for the dump
+        self.window = deque(maxlen=window)
+        self.frames = deque(maxlen=max_frames)
+        self.current = {}
+        self.frame_start = None
+        # Sections and counters only record on the thread running the frames, so
+        # work on background threads (e.g. building the next level) stays out of them
+        self.frame_thread = threading.main_thread().ident
+        self.columns = []
+        # Startup phases, recorded whether or not frame profiling is on
+        self.phases = []
+
+    def section(self, name):
+        """Time a block: `with profiler.section("level.tick"): ...`"""
+        if not self.enabled or threading.get_ident() != self.frame_thread:
+            return _NULL_SECTION
+        return _Section(self, name)
+
+    def phase(self, name):
+        """Time a startup step: `with profiler.phase("fonts"): ...` (safe from any thread)."""
+        return _Phase(self, name)
+
+    def mark(self, name):
+        """Record a startup milestone (e.g. the first frame) as a zero-length phase."""
+        now = time.perf_counter()
+        self.phases.append((name, 0.0, now - STARTED, threading.current_thread().name))
+
+    def startup_report(self):
+        """One line per startup phase: duration, time since start and the thread it ran on."""
+        return [f"{name:<20} {seconds * 1000:8.1f} ms  at {at * 1000:8.1f} ms  ({thread})"
+                for name, seconds, at, thread in self.phases]
+
+    def count(self, name, n=1):
+        """Add n to a per-frame counter (e.g. wall-collision tests)."""
+        if self.enabled and threading.get_ident() == self.frame_thread:
+            self.current[name] = self.current.get(name, 0) + n
+
+    def begin_frame(self):
+        if self.enabled:
+            self.frame_thread = threading.get_ident()
+            self.current = {}
+            self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        if not self.enabled or self.frame_start is None:
+            return
+        frame_time = time.perf_counter() - self.frame_start
+        self.current["frame"] = frame_time
+        for name in self.current:
+            if name not in self.columns:
+                self.columns.append(name)
+        self.frames.append(self.current)
+        self.window.append(frame_time)
+        self.current = {}
+
+    def toggle_overlay(self):
+        """Show or hide the on-screen overlay (also turns profiling on)."""
+        self.enabled = True
+        self.overlay_visible = not self.overlay_visible
+
+    def stats(self):
+        """Return (fps, p50 ms, p99 ms) over the recent window."""
+        if not self.window:
+            return 0.0, 0.0, 0.0
+        ordered = sorted(self.window)
+        p50 = ordered[len(ordered) // 2]
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        mean = sum(ordered) / len(ordered)
+        return (1.0 / mean if mean > 0 else 0.0), p50 * 1000, p99 * 1000
+
+    def draw_overlay(self, screen, font, topleft=(10, 70)):
+        """Draw FPS and frame-time percentiles; returns the rect drawn (None if hidden)."""
+        if not self.overlay_visible:
+            return None
+        fps, p50, p99 = self.stats()
+        last = self.frames[-1] if self.frames else {}
+        lines = [f"{fps:5.1f} fps  p50 {p50:5.2f} ms  p99 {p99:5.2f} ms"]
+        for name in self.columns:
+            if name != "frame" and name in last:
+                value = last[name]
+                lines.append(f"{name:<20} {value * 1000:6.2f} ms" if isinstance(value, float) else f"{name:<20} {value:6d}")
+        surfaces = [font.render(line, True, (255, 255, 0)) for line in lines]
+        width = max(s.get_width() for s in surfaces) + 10
+        height = sum(s.get_height() for s in surfaces) + 10
+        rect = pygame.Rect(topleft, (width, height))
+        pygame.draw.rect(screen, (0, 0, 0), rect)
+        y = topleft[1] + 5
+        for surface in surfaces:
+            screen.blit(surface, (topleft[0] + 5, y))
+            y += surface.get_height()
+        return rect
+
+    def dump(self, path):
+        """Write every recorded frame to path as CSV or JSON (chosen by extension)."""
+        if path.endswith(".json"):
+            with open(path, "w") as f:
+                json.dump({"columns": self.columns, "frames": list(self.frames),
+                           "startup": [{"phase": name, "seconds": seconds, "at": at, "thread": thread}
+                                       for name, seconds, at, thread in self.phases]}, f)
+            return
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=self.columns, restval="")
+            writer.writeheader()
+            writer.writerows(self.frames)
+
+# Shared instance; enable with KQ_PROFILE=1 or toggle the overlay in game with F3
+profiler = Profiler(enabled=os.environ.get("KQ_PROFILE") == "1")
@@ -0,0 +1,245 @@
+import argparse
+import hashlib
+import json
+import os
+import struct
+import time
+from simulation import Simulation
+from levelpack import load_levels, default_levels_path, encode_level
+
+# Replay log layout (little-endian): a header followed by a stream of
+# one-byte opcodes, each with a fixed-size payload.
+MAGIC = b"KQRP"
+VERSION = 1
+HEADER = struct.Struct("<4sH3dI20s")   # magic, version, x, y, bounds, start level, levels digest
+OP_FRAME_SHORT = 1                      # int16 x, y (mouse positions)
+OP_FRAME_FLOAT = 2                      # float64 x, y (bots and other sub-pixel input)
+OP_REPEAT = 3                           # uint16 count of frames reusing the previous target
+OP_LEVEL = 4                            # uint32 level index that just started
+OP_DEATH = 5                            # no payload; the player was caught and the level reset
+OP_END = 6                              # uint32 frames, float64 final time shown to the player
+PAYLOADS = {
+    OP_FRAME_SHORT: struct.Struct("<hh"),
+    OP_FRAME_FLOAT: struct.Struct("<dd"),
+    OP_REPEAT: struct.Struct("<H"),
+    OP_LEVEL: struct.Struct("<I"),
+    OP_DEATH: struct.Struct("<"),
+    OP_END: struct.Struct("<Id"),
+}
+
+_digests = {}
+
+def levels_digest(levels):
+    """
+    Fingerprint of the level data so a replay is only run against the levels
+    it was recorded on. Every level is hashed in its pack record form, so
+    levels.json and a pack compiled from it agree, and a LevelPack's records
+    are hashed as stored without decoding them.
+    """
+    cached = _digests.get(id(levels))
+    if cached is not None and cached[0] is levels:
+        return cached[1]
+    record = getattr(levels, "record", None)
+    sha = hashlib.sha1()
+    for i in range(len(levels)):
+        data = record(i) if record is not None else encode_level(levels[i])
+        sha.update(struct.pack("<I", len(data)))
+        sha.update(data)
+    digest = sha.digest()
+    _digests[id(levels)] = (levels, digest)
+    return digest
+
+class Recorder:
+    """
+    Records the per-frame target fed to the simulation plus level starts and
+    deaths into an in-memory log. Attach it as a Level observer and call
+    record_frame() before every Simulation.step().
+    """
+    def __init__(self, levels, x, y, bounds, start_level=0):
+        self.data = bytearray(HEADER.pack(MAGIC, VERSION, x, y, bounds, start_level, levels_digest(levels)))
+        self.last_target = None
+        self.repeat = 0
+        self.frames = 0
+
+    def _op(self, op, *payload):
+        self.data.append(op)
+        self.data += PAYLOADS[op].pack(*payload)
+
+    def _flush_repeat(self):
+        while self.repeat:
+            count = min(self.repeat, 0xFFFF)
+            self._op(OP_REPEAT, count)
+            self.repeat -= count
+
+    def record_frame(self, x, y):
+        self.frames += 1
+        if (x, y) == self.last_target:
+            self.repeat += 1
+            return
+        self._flush_repeat()
+        self.last_target = (x, y)
+        if x == int(x) and y == int(y) and -32768 <= x < 32768 and -32768 <= y < 32768:
+            self._op(OP_FRAME_SHORT, int(x), int(y))
+        else:
+            self._op(OP_FRAME_FLOAT, x, y)
+
+    def on_level_event(self, level, event):
+        """Level observer hook: mark level starts and deaths for validation."""
+        if event == "start":
+            self._flush_repeat()
+            self._op(OP_LEVEL, level.index or 0)
+        elif event == "death":
+            self._flush_repeat()
+            self._op(OP_DEATH)
+
+    def finish(self, final_time=0.0):
+        self._flush_repeat()
+        self._op(OP_END, self.frames, final_time)
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(self.data)
+
+class _StartLog:
+    """Observer collecting the index of every level started during a replay."""
+    def __init__(self):
+        self.indices = []
+
+    def on_level_event(self, level, event):
+        if event == "start":
+            self.indices.append(level.index)
+
+class Replay:
+    """A recorded run: header fields plus the decoded op stream."""
+    def __init__(self, data):
+        magic, version, self.x, self.y, self.bounds, self.start_level, self.digest = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"not a version {VERSION} replay")
+        self.ops = []
+        offset = HEADER.size
+        while offset < len(data):
+            op = data[offset]
+            payload = PAYLOADS.get(op)
+            if payload is None:
+                raise ValueError(f"unknown replay opcode {op} at byte {offset}")
+            self.ops.append((op, payload.unpack_from(data, offset + 1)))
+            offset += 1 + payload.size
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls(f.read())
+
+    def targets(self):
+        """Yield the target for every frame, expanding repeats."""
+        target = None
+        for op, payload in self.ops:
+            if op in (OP_FRAME_SHORT, OP_FRAME_FLOAT):
+                target = payload
+                yield target
+            elif op == OP_REPEAT:
+                for _ in range(payload[0]):
+                    yield target
+
+    def simulation(self, levels, observers=None):
+        """Build a simulation matching the recording and check the levels are the same."""
+        if levels_digest(levels) != self.digest:
+            raise ValueError("replay was recorded against different level data")
+        simulation = Simulation(levels, self.x, self.y, self.bounds, observers)
+        simulation.start(self.start_level)
+        return simulation
+
+    def expected(self):
+        """Return (frames, final time, deaths, level starts) as recorded."""
+        frames, final_time = 0, 0.0
+        deaths = 0
+        starts = []
+        for op, payload in self.ops:
+            if op == OP_END:
+                frames, final_time = payload
+            elif op == OP_DEATH:
+                deaths += 1
+            elif op == OP_LEVEL:
+                starts.append(payload[0])
+        return frames, final_time, deaths, starts
+
+    def run(self, levels, on_frame=None):
+        """
+        Re-run the recorded inputs. on_frame(simulation) is called after each
+        step (rendering uses it); headless runs go as fast as the CPU allows.
+        Returns a report comparing the result with what was recorded.
+        """
+        starts = _StartLog()
+        simulation = self.simulation(levels, [starts])
+        for x, y in self.targets():
+            simulation.step(x, y)
+            if on_frame is not None and on_frame(simulation) is False:
+                break
+        frames, final_time, deaths, recorded_starts = self.expected()
+        return {
+            "finished": simulation.finished,
+            "frames": simulation.frame,
+            "time": simulation.time,
+            "deaths": simulation.deaths,
+            "splits": simulation.splits,
+            "recorded_frames": frames,
+            "recorded_final_time": final_time,
+            "matches": (simulation.frame == frames and simulation.deaths == deaths
+                        and starts.indices == recorded_starts),
+        }
+
+def play_rendered(replay, levels, speed=1.0):
+    """Watch a replay in a window at speed times real time."""
+    import pygame
+    pygame.init()
+    # The board keeps its recorded position, so size the window around it
+    screen = pygame.display.set_mode((int(replay.x * 2 + replay.bounds), int(replay.y * 2 + replay.bounds)))
+    font = pygame.font.Font("assets/fonts/Firlest-Regular.otf", 48)
+    clock = pygame.time.Clock()
+    frame_budget = [0.0]
+
+    def draw(simulation):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return False
+        # Only draw (and wait) once per real frame; extra simulated steps run unrendered
+        frame_budget[0] += 1.0
+        if frame_budget[0] < speed:
+            return True
+        frame_budget[0] -= speed
+        screen.fill("black")
+        simulation.level.draw(screen, font)
+        pygame.display.flip()
+        clock.tick(60 * min(speed, 1.0))
+        return True
+
+    result = replay.run(levels, draw)
+    pygame.quit()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-run a recorded Knight's Quest run.")
+    parser.add_argument("replay")
+    parser.add_argument("--levels", default=None, help="levels.json or .kqp the run was recorded on")
+    parser.add_argument("--render", action="store_true", help="show the replay in a window")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed when rendering")
+    args = parser.parse_args()
+
+    levels = load_levels(args.levels or default_levels_path())
+    replay = Replay.load(args.replay)
+    start = time.perf_counter()
+    if args.render:
+        result = play_rendered(replay, levels, args.speed)
+    else:
+        result = replay.run(levels)
+    elapsed = time.perf_counter() - start
+    print(json.dumps(result, indent=2))
+    if not args.render and elapsed > 0:
+        print(f"Replayed {result['frames']} frames in {elapsed:.3f}s ({result['frames'] / elapsed:.0f} frames/s)")
+    return 0 if result["matches"] else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,237 @@
+import argparse
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from levelpack import load_levels, default_levels_path
+from replay import levels_digest
+from simulation import DT
+
+# Runs are only ranked against runs on the same level data (replay.levels_digest)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    digest BLOB NOT NULL,
+    finished_at REAL NOT NULL,
+    frames INTEGER NOT NULL,
+    time REAL NOT NULL,
+    deaths INTEGER NOT NULL,
+    replay_path TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_by_frames ON runs (digest, frames);
+CREATE TABLE IF NOT EXISTS splits (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    level INTEGER NOT NULL,
+    frames INTEGER NOT NULL,
+    deaths INTEGER NOT NULL,
+    PRIMARY KEY (run_id, level)
+) WITHOUT ROWID;
+-- Runs per (level data, total frames): ranks sum over distinct times instead of counting every run
+CREATE TABLE IF NOT EXISTS leaderboard (
+    digest BLOB NOT NULL,
+    frames INTEGER NOT NULL,
+    runs INTEGER NOT NULL,
+    PRIMARY KEY (digest, frames)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS boards (
+    digest BLOB PRIMARY KEY,
+    runs INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+# Runs written per transaction at most
+MAX_BATCH = 256
+
+def make_run(simulation, levels, replay_path=None):
+    """
+    Build a run record from a finished Simulation. splits holds
+    (frames, deaths) per level, timed from that level's start.
+    """
+    ends = simulation.splits
+    starts = [0] + ends[:-1]
+    return {
+        "digest": levels_digest(levels),
+        "finished_at": time.time(),
+        "frames": simulation.frame,
+        "time": simulation.time,
+        "deaths": simulation.deaths,
+        "replay_path": replay_path,
+        "splits": [(end - start, deaths) for start, end, deaths in zip(starts, ends, simulation.level_deaths)],
+    }
+
+class RunStore:
+    """
+    SQLite run history and leaderboard. submit() queues a finished run and
+    returns at once; a writer thread inserts queued runs in batches (one
+    transaction each) and resolves each run's Future with its standing: rank,
+    number of runs and the personal best it was up against. The query
+    methods read through a separate connection and never wait on the writer.
+    """
+    def __init__(self, path="runs.db"):
+        self.path = path
+        self.queue = queue.Queue()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        self.reader = self._connect(check_same_thread=False)
+        self.reader_lock = threading.Lock()
+        self.writer = threading.Thread(target=self._write_loop, name="runs", daemon=True)
+        self.writer.start()
+
+    def _connect(self, check_same_thread=True):
+        conn = sqlite3.connect(self.path, check_same_thread=check_same_thread)
+        # WAL lets the completion screen read while the writer thread commits
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def submit(self, run):
+        """
+        Queue a run for saving. Returns a Future of its standing: rank, runs
+        (including this one), personal_best, previous_best (a run with splits,
+        or None) and the stored id.
+        """
+        future = Future()
+        self.queue.put((run, future))
+        return future
+
+    def _write_loop(self):
+        conn = self._connect()
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    return
+                batch = [item]
+                while len(batch) < MAX_BATCH:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        self.queue.put(None)
+                        break
+                    batch.append(item)
+                self._write_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _write_batch(self, conn, batch):
+        results = []
+        try:
+            with conn:
+                for run, future in batch:
+                    # Standing against the runs stored before this one
+                    standing = self._standing(conn, run["digest"], run["frames"])
+                    cursor = conn.execute(
+                        "INSERT INTO runs (digest, finished_at, frames, time, deaths, replay_path) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (run["digest"], run["finished_at"], run["frames"], run["time"],
+                         run["deaths"], run["replay_path"]))
+                    conn.execute(
+                        "INSERT INTO leaderboard (digest, frames, runs) VALUES (?, ?, 1) "
+                        "ON CONFLICT (digest, frames) DO UPDATE SET runs = runs + 1",
+                        (run["digest"], run["frames"]))
+                    conn.execute(
+                        "INSERT INTO boards (digest, runs) VALUES (?, 1) "
+                        "ON CONFLICT (digest) DO UPDATE SET runs = runs + 1", (run["digest"],))
+                    conn.executemany(
+                        "INSERT INTO splits (run_id, level, frames, deaths) VALUES (?, ?, ?, ?)",
+                        [(cursor.lastrowid, level, frames, deaths)
+                         for level, (frames, deaths) in enumerate(run["splits"])])
+                    standing["id"] = cursor.lastrowid
+                    results.append((future, standing))
+        except sqlite3.Error as e:
+            print(f"Error saving runs to {self.path}: {e}")
+            for run, future in batch:
+                future.set_exception(e)
+            return
+        for future, standing in results:
+            future.set_result(standing)
+
+    def _standing(self, conn, digest, frames):
+        ahead = conn.execute(
+            "SELECT TOTAL(runs) FROM leaderboard WHERE digest = ? AND frames < ?", (digest, frames)).fetchone()[0]
+        row = conn.execute("SELECT runs FROM boards WHERE digest = ?", (digest,)).fetchone()
+        best = self._personal_best(conn, digest)
+        return {
+            "rank": int(ahead) + 1,
+            "runs": (row[0] if row else 0) + 1,
+            "personal_best": best is None or frames < best["frames"],
+            "previous_best": best,
+        }
+
+    def _personal_best(self, conn, digest):
+        row = conn.execute(
+            "SELECT id, finished_at, frames, time, deaths, replay_path FROM runs "
+            "WHERE digest = ? ORDER BY frames, id LIMIT 1", (digest,)).fetchone()
+        if row is None:
+            return None
+        run = self._row(row)
+        run["splits"] = conn.execute(
+            "SELECT frames, deaths FROM splits WHERE run_id = ? ORDER BY level", (run["id"],)).fetchall()
+        return run
+
+    @staticmethod
+    def _row(row):
+        keys = ("id", "finished_at", "frames", "time", "deaths", "replay_path")
+        return dict(zip(keys, row))
+
+    def top(self, digest, n=10):
+        """The n fastest runs on this level data, fastest first."""
+        with self.reader_lock:
+            rows = self.reader.execute(
+                "SELECT id, finished_at, frames, time, deaths, replay_path FROM runs "
+                "WHERE digest = ? ORDER BY frames, id LIMIT ?", (digest, n)).fetchall()
+        return [self._row(row) for row in rows]
+
+    def personal_best(self, digest):
+        """The fastest stored run with its per-level splits, or None."""
+        with self.reader_lock:
+            return self._personal_best(self.reader, digest)
+
+    def rank(self, digest, frames):
+        """1-based leaderboard position a run of this many frames would take."""
+        with self.reader_lock:
+            return int(self.reader.execute(
+                "SELECT TOTAL(runs) FROM leaderboard WHERE digest = ? AND frames < ?",
+                (digest, frames)).fetchone()[0]) + 1
+
+    def close(self):
+        """Write whatever is still queued and stop the writer."""
+        self.queue.put(None)
+        self.writer.join()
+        with self.reader_lock:
+            self.reader.close()
+
+def format_frames(frames):
+    """Frames as M:SS.mmm of simulated time."""
+    seconds = frames * DT
+    return f"{int(seconds // 60)}:{seconds % 60:06.3f}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the leaderboard of stored runs.")
+    parser.add_argument("--db", default="runs.db", help="run store to read")
+    parser.add_argument("--levels", default=None, help="levels.json or .kqp the runs were played on")
+    parser.add_argument("--top", type=int, default=10, help="number of runs to list")
+    args = parser.parse_args()
+
+    levels = load_levels(args.levels or default_levels_path())
+    digest = levels_digest(levels)
+    store = RunStore(args.db)
+    try:
+        runs = store.top(digest, args.top)
+        best = store.personal_best(digest)
+    finally:
+        store.close()
+    if not runs:
+        print("No runs stored for these levels")
+        return 0
+    for position, run in enumerate(runs, 1):
+        finished = time.strftime("%Y-%m-%d %H:%M", time.localtime(run["finished_at"]))
+        print(f"{position:>3}. {format_frames(run['frames']):>10}  {run['deaths']:>3} deaths  {finished}  "
+              f"{run['replay_path'] or ''}")
+    print("Personal best splits: " + "  ".join(format_frames(frames) for frames, _ in best["splits"]))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
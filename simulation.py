@@ -0,0 +1,162 @@
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from level import Level
+from levelpack import load_levels, default_levels_path
+
+# Fixed simulation step in seconds; every Level.step() advances the game by exactly this much
+DT = 1 / 60
+
+class Simulation:
+    """
+    Headless game core: owns the current Level and advances it one fixed DT per
+    step from an explicit target point. Rendering and audio are optional and
+    hook in as Level observers, so this runs without a display or mixer.
+
+    With preload, the next level is built (and its sprites scaled) on a worker
+    thread while the current one is played, so moving on is a reference swap.
+    keep_recent levels already played are kept to be recycled by later runs.
+    """
+    def __init__(self, levels, x=0, y=0, bounds=800, observers=None, preload=False, keep_recent=0):
+        self.levels = levels
+        self.x = x
+        self.y = y
+        self.bounds = bounds
+        self.observers = list(observers) if observers else []
+        self.preload = preload
+        self.keep_recent = keep_recent
+        self.executor = ThreadPoolExecutor(max_workers=1) if preload else None
+        # Level index -> Future of a Level being built on the worker
+        self.pending = {}
+        # Level index -> Level played recently, least recently used first
+        self.recent = OrderedDict()
+
+        self.level_num = 0
+        self.level = None
+        self.frame = 0
+        self.finished = False
+        # Frame number at which each level was completed, and the deaths on it
+        self.splits = []
+        self.level_deaths = []
+        self.past_deaths = 0
+
+    def load_level(self, level_num):
+        """Build (but don't start) the Level with the given index."""
+        return Level(self.x, self.y, self.bounds, self.bounds, self.levels[level_num],
+                     self.observers, index=level_num)
+
+    def _build(self, level_num):
+        """Worker: build a level and get its images ready for drawing."""
+        level = self.load_level(level_num)
+        level.warm()
+        return level
+
+    def preload_level(self, level_num):
+        """Start building a level on the worker thread unless it is already built or on its way."""
+        if (self.executor is None or not 0 <= level_num < len(self.levels)
+                or level_num in self.pending or level_num in self.recent):
+            return
+        self.pending[level_num] = self.executor.submit(self._build, level_num)
+
+    def acquire_level(self, level_num):
+        """Return a Level ready to start: preloaded, recycled from the recent ones, or built now."""
+        future = self.pending.pop(level_num, None)
+        if future is not None:
+            # Only waits if the worker hasn't finished yet
+            level = future.result()
+            level.observers = list(self.observers)
+            return level
+        level = self.recent.pop(level_num, None)
+        if level is not None:
+            level.recycle(self.observers)
+            return level
+        return self.load_level(level_num)
+
+    def enter_level(self, level_num):
+        """Make level_num the current level and start preparing the one after it."""
+        previous = self.level
+        if previous is not None and self.keep_recent:
+            self.recent[previous.index] = previous
+            self.recent.move_to_end(previous.index)
+            while len(self.recent) > self.keep_recent:
+                self.recent.popitem(last=False)
+        # Swapping the reference is the whole transition
+        self.level = self.acquire_level(level_num)
+        self.level_num = level_num
+        self.level.start()
+        self.preload_level(level_num + 1)
+
+    def start(self, level_num=0):
+        """Start a fresh run from the given level."""
+        self.frame = 0
+        self.finished = False
+        self.splits = []
+        self.level_deaths = []
+        self.past_deaths = 0
+        self.enter_level(level_num)
+
+    def close(self):
+        """Stop the preload worker."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            self.pending.clear()
+
+    @property
+    def time(self):
+        """Simulated time in seconds."""
+        return self.frame * DT
+
+    @property
+    def deaths(self):
+        """Dragon deaths across the whole run."""
+        if self.level is None or self.finished:
+            return self.past_deaths
+        return self.past_deaths + self.level.deaths
+
+    def step(self, target_x, target_y):
+        """
+        Advance one fixed step with the player steering towards (target_x, target_y).
+        Moves on to the next level when the exit is reached.
+        Returns True once the last level has been completed.
+        """
+        if self.finished:
+            return True
+        self.frame += 1
+        if self.level.step(target_x, target_y):
+            self.splits.append(self.frame)
+            self.level_deaths.append(self.level.deaths)
+            self.past_deaths += self.level.deaths
+            if self.level_num + 1 < len(self.levels):
+                self.enter_level(self.level_num + 1)
+            else:
+                self.level_num += 1
+                self.finished = True
+        return self.finished
+
+    def run(self, policy, max_steps):
+        """
+        Step until the run finishes or max_steps is reached.
+        policy(simulation) returns the (x, y) target for the next step.
+        """
+        while not self.finished and self.frame < max_steps:
+            self.step(*policy(self))
+        return self.finished
+
+def seek_exit(simulation):
+    """Trivial policy: walk straight at the current level's exit."""
+    return simulation.level.exit.x, simulation.level.exit.y
+
+if __name__ == "__main__":
+    levels = load_levels(default_levels_path())
+    steps = 0
+    start = time.perf_counter()
+    for i in range(len(levels)):
+        simulation = Simulation(levels)
+        simulation.start(i)
+        simulation.run(seek_exit, 3600)
+        steps += simulation.frame
+        print(f"{levels[i]['name']}: {'completed' if simulation.splits else 'not completed'} "
+              f"after {simulation.frame} steps, {simulation.deaths} deaths")
+    elapsed = time.perf_counter() - start
+    print(f"{steps} steps in {elapsed:.2f}s ({steps / elapsed:.0f} steps/s)")
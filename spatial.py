@@ -0,0 +1,69 @@
+import math
+from collision import SegmentArray
+
+class SpatialGrid:
+    """Uniform grid over wall/door segments so collision queries only test nearby segments."""
+    def __init__(self, left, top, width, height, cell_size):
+        self.left = left
+        self.top = top
+        self.cell_size = max(1.0, cell_size)
+        self.cols = max(1, int(math.ceil(width / self.cell_size)))
+        self.rows = max(1, int(math.ceil(height / self.cell_size)))
+        # Segment endpoints live in one batch array; cells hold indices into it
+        self.segments = SegmentArray()
+        # (col, row) -> list of segment indices overlapping that cell
+        self.cells = {}
+
+    def _cell_range(self, min_x, min_y, max_x, max_y):
+        """Return the clamped (col0, row0, col1, row1) cell range covering a box."""
+        col0 = min(max(int((min_x - self.left) // self.cell_size), 0), self.cols - 1)
+        row0 = min(max(int((min_y - self.top) // self.cell_size), 0), self.rows - 1)
+        col1 = min(max(int((max_x - self.left) // self.cell_size), 0), self.cols - 1)
+        row1 = min(max(int((max_y - self.top) // self.cell_size), 0), self.rows - 1)
+        return col0, row0, col1, row1
+
+    def _segment_cells(self, segment):
+        """Yield every cell the segment's bounding box touches."""
+        col0, row0, col1, row1 = self._cell_range(
+            min(segment.x1, segment.x2), min(segment.y1, segment.y2),
+            max(segment.x1, segment.x2), max(segment.y1, segment.y2))
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                yield (col, row)
+
+    def insert(self, segment):
+        """Add a segment (Wall or Door) to the grid."""
+        if id(segment) in self.segments.index:
+            # Re-inserting a previously removed door just re-enables it
+            self.segments.set_active(self.segments.index_of(segment), True)
+            return
+        i = self.segments.add(segment)
+        for cell in self._segment_cells(segment):
+            self.cells.setdefault(cell, []).append(i)
+
+    def remove(self, segment):
+        """Remove a segment, e.g. when a door unlocks."""
+        if id(segment) in self.segments.index:
+            self.segments.set_active(self.segments.index_of(segment), False)
+
+    def query(self, min_x, min_y, max_x, max_y):
+        """Return the indices of segments whose cells overlap a box."""
+        col0, row0, col1, row1 = self._cell_range(min_x, min_y, max_x, max_y)
+        if col0 == col1 and row0 == row1:
+            return self.cells.get((col0, row0), [])
+        found = set()
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                found.update(self.cells.get((col, row), ()))
+        return found
+
+    def collides(self, x, y, radius):
+        """Return True if a circle at (x, y) hits any segment in the grid."""
+        indices = self.query(x - radius, y - radius, x + radius, y + radius)
+        return self.segments.collides(x, y, radius, indices)
+
+    def sweep(self, x, y, move_x, move_y, radius):
+        """Sweep a circle by (move_x, move_y); returns (time of impact, normal x, normal y) or None."""
+        indices = self.query(min(x, x + move_x) - radius, min(y, y + move_y) - radius,
+                             max(x, x + move_x) + radius, max(y, y + move_y) + radius)
+        return self.segments.sweep(x, y, move_x, move_y, radius, indices)
@@ -0,0 +1,151 @@
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import time
+from multiprocessing import Pool
+from simulation import Simulation
+from nav import NavGrid
+from levelpack import load_levels
+
+class RouteFollower:
+    """Policy that walks the player through a list of waypoints, restarting after each death."""
+    def __init__(self, waypoints, reach):
+        self.waypoints = waypoints
+        self.reach = reach
+        self.index = 0
+        self.deaths = 0
+
+    def __call__(self, simulation):
+        level = simulation.level
+        if level.deaths != self.deaths:
+            # The level was reset, start the route again from the spawn
+            self.deaths = level.deaths
+            self.index = 0
+        player = level.player
+        while self.index < len(self.waypoints) - 1:
+            x, y = self.waypoints[self.index]
+            if math.hypot(player.x - x, player.y - y) > self.reach:
+                break
+            self.index += 1
+        return self.waypoints[self.index]
+
+def plan_route(simulation, key_order, seed=None):
+    """
+    Plan waypoints visiting the keys in key_order and then the exit.
+    Returns None if some target cannot be reached. A seed jitters the
+    waypoints so each variant takes a slightly different line.
+    """
+    level = simulation.load_level(simulation.level_num)
+    # The player needs its full radius of clearance, on a finer grid than the dragons'
+    radius = level.size / 2
+    planner = NavGrid(level, cell_size=radius / 2, clearance=radius)
+    rng = random.Random(seed) if seed is not None else None
+    position = (level.player.x, level.player.y)
+    targets = [level.keys[i] for i in key_order] + [level.exit]
+    waypoints = []
+    for target in targets:
+        leg = planner.path(position, (target.x, target.y))
+        if leg is None:
+            return None
+        if rng is not None:
+            jitter = planner.cell_size / 3
+            leg = [(x + rng.uniform(-jitter, jitter), y + rng.uniform(-jitter, jitter))
+                   for x, y in leg[:-1]] + leg[-1:]
+        waypoints.extend(leg)
+        position = (target.x, target.y)
+        if target in level.keys:
+            for door in level.doors:
+                if door.door_id == target.key_id:
+                    level.collision_grid.remove(door)
+                    planner.update_door(door)
+    return waypoints
+
+def simulate(job):
+    """Worker: run one policy on one level and report how it went."""
+    level_index, config, policy, key_order, seed, bounds, max_frames = job
+    simulation = Simulation([config], bounds=bounds)
+    simulation.start()
+    level = simulation.level
+    if policy == "direct":
+        # Walk straight at each key in order and then the exit
+        targets = [(level.keys[i].x, level.keys[i].y) for i in key_order]
+        follower = RouteFollower(targets + [(level.exit.x, level.exit.y)], level.size / 2)
+    else:
+        waypoints = plan_route(simulation, key_order, seed)
+        if waypoints is None:
+            return {"level": level_index, "policy": policy, "completed": False,
+                    "frames": None, "deaths": 0, "planned": False}
+        follower = RouteFollower(waypoints, level.player.speed * 2)
+    completed = simulation.run(follower, max_frames)
+    return {"level": level_index, "policy": policy, "completed": completed,
+            "frames": simulation.frame if completed else None,
+            "deaths": simulation.deaths, "planned": True}
+
+def make_jobs(levels, variants, max_orders, bounds, max_frames):
+    """Build one job per (level, policy, key order, variant)."""
+    jobs = []
+    for level_index, config in enumerate(levels):
+        keys = range(len(config.get('keys', [])))
+        orders = list(itertools.islice(itertools.permutations(keys), max_orders))
+        for order in orders:
+            jobs.append((level_index, config, "direct", order, None, bounds, max_frames))
+            jobs.append((level_index, config, "search", order, None, bounds, max_frames))
+            for seed in range(variants):
+                jobs.append((level_index, config, "search", order, seed, bounds, max_frames))
+    return jobs
+
+def summarize(levels, results):
+    """Fold per-run results into one report entry per level."""
+    report = []
+    for level_index, config in enumerate(levels):
+        runs = [r for r in results if r["level"] == level_index]
+        times = [r["frames"] for r in runs if r["completed"]]
+        report.append({
+            "level": level_index,
+            "name": config['name'],
+            "runs": len(runs),
+            "completable": bool(times),
+            "fastest_frames": min(times) if times else None,
+            "completion_rate": len(times) / len(runs) if runs else 0.0,
+            "death_rate": sum(1 for r in runs if r["deaths"]) / len(runs) if runs else 0.0,
+            "mean_deaths": sum(r["deaths"] for r in runs) / len(runs) if runs else 0.0,
+        })
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate scripted and search-driven runs over a level pack.")
+    parser.add_argument("levels", nargs="?", default="levels.json", help="levels.json or a compiled .kqp pack")
+    parser.add_argument("--variants", type=int, default=4, help="jittered search runs per key order")
+    parser.add_argument("--orders", type=int, default=6, help="maximum key orderings tried per level")
+    parser.add_argument("--bounds", type=float, default=800, help="board size in pixels")
+    parser.add_argument("--max-frames", type=int, default=60 * 120)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    levels = load_levels(args.levels)
+
+    start = time.perf_counter()
+    jobs = make_jobs(levels, args.variants, args.orders, args.bounds, args.max_frames)
+    with Pool(args.processes) as pool:
+        results = list(pool.imap_unordered(simulate, jobs, chunksize=4))
+    report = summarize(levels, results)
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for entry in report:
+            fastest = f"{entry['fastest_frames']} frames" if entry['completable'] else "-"
+            print(f"{entry['name']:<32} {'OK ' if entry['completable'] else 'FAIL'}  "
+                  f"fastest {fastest:<12} completion {entry['completion_rate']:.0%}  "
+                  f"death rate {entry['death_rate']:.0%}")
+        print(f"{len(jobs)} runs over {len(levels)} levels in {elapsed:.2f}s")
+    # Non-zero exit status when any level cannot be completed, for CI
+    return 0 if all(entry['completable'] for entry in report) else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
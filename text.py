@@ -0,0 +1,63 @@
+import pygame
+from collections import OrderedDict
+from assets import assets
+
+class TextCache:
+    """Rendered text surfaces keyed by (font, string, color), evicted least recently used first."""
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def render(self, font, text, color, antialias=True):
+        key = (id(font), text, tuple(color), antialias)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            return surface
+        surface = assets.convert(font.render(text, antialias, color))
+        self.entries[key] = surface
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.entries.clear()
+
+class GlyphAtlas:
+    """
+    Per-character surfaces for a monospace font, so strings like the timer's
+    "MM:SS.mmm" are composed from cached glyphs instead of re-rendered.
+    """
+    def __init__(self, font, color, antialias=True):
+        self.font = font
+        self.color = color
+        self.antialias = antialias
+        self.glyphs = {}
+        self.height = font.get_linesize()
+
+    def glyph(self, char):
+        surface = self.glyphs.get(char)
+        if surface is None:
+            surface = assets.convert(self.font.render(char, self.antialias, self.color))
+            self.glyphs[char] = surface
+        return surface
+
+    def size(self, text):
+        """Return the (width, height) the composed text occupies."""
+        width = 0
+        height = 0
+        for char in text:
+            glyph = self.glyph(char)
+            width += glyph.get_width()
+            height = max(height, glyph.get_height())
+        return width, height
+
+    def blit(self, screen, text, topleft):
+        """Blit text glyph by glyph with its top-left corner at topleft and return its rect."""
+        x, y = topleft
+        width, height = self.size(text)
+        for char in text:
+            glyph = self.glyph(char)
+            screen.blit(glyph, (x, y))
+            x += glyph.get_width()
+        return pygame.Rect(topleft[0], topleft[1], width, height)